@@ -1,61 +1,368 @@
 # archivo: gestion_conexion.py
 
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+
+
+class _Entrada:
+    """
+    Conexion sqlite3 del pool junto con su clave y el momento en que se devolvio.
+    """
+    __slots__ = ("clave", "conexion", "ultimo_uso")
+
+    def __init__(self, clave, conexion):
+        self.clave = clave
+        self.conexion = conexion
+        self.ultimo_uso = time.monotonic()
+
+
+class _Espera:
+    """
+    Hilo esperando una conexion: al quedar una libre se le entrega directamente
+    (entrada) o se le da permiso para abrir una nueva (abrir).
+    """
+    __slots__ = ("condicion", "entrada", "abrir")
+
+    def __init__(self, cerrojo):
+        self.condicion = threading.Condition(cerrojo)
+        self.entrada = None
+        self.abrir = False
+
+
+class PoolConexiones:
+    def __init__(self, nombre_bd, maximo=8, inactividad=60.0, verificar_tras=5.0, espera=30.0):
+        """
+        Pool acotado de conexiones sqlite3 a `nombre_bd` (como mucho `maximo`
+        abiertas a la vez). Las conexiones libres se guardan en un OrderedDict
+        de la menos a la mas recientemente devuelta, asi que sacar y devolver
+        son O(1): cada hilo recupera si puede la ultima conexion que uso y si
+        no la devuelta mas reciente. Las que pasan `inactividad` segundos sin
+        usarse se cierran, y las que llevan mas de `verificar_tras` segundos
+        paradas se comprueban con 'SELECT 1' antes de entregarlas. Si no hay
+        ninguna libre y se llego al maximo se espera hasta `espera` segundos,
+        por orden de llegada: la conexion que se devuelve pasa directamente al
+        primer hilo en espera.
+        Ojo: con ':memory:' cada conexion tiene su propia base de datos.
+        """
+        self.nombre_bd = nombre_bd
+        self.maximo = maximo
+        self.inactividad = inactividad
+        self.verificar_tras = verificar_tras
+        self.espera = espera
+        self._libres = OrderedDict()          # clave -> _Entrada
+        self._total = 0                       # conexiones abiertas (libres + en uso)
+        self._cerrojo = threading.Lock()
+        self._esperas = deque()               # _Espera por orden de llegada
+        self._diferidas = deque()             # devoluciones de finalizadores pendientes de procesar
+        self._claves = itertools.count()
+        self._hilo = threading.local()        # clave de la ultima conexion de cada hilo
+        self.cerrado = False
+
+    def _abrir(self):
+        # autocommit: cada consulta se confirma salvo dentro de un BEGIN explicito.
+        # check_same_thread=False porque la conexion pasa de un hilo a otro (de uno en uno).
+        conexion = sqlite3.connect(self.nombre_bd, isolation_level=None, check_same_thread=False)
+        return _Entrada(next(self._claves), conexion)
+
+    def _expirar(self, ahora):
+        """Cierra las conexiones libres que superan el tiempo de inactividad (las mas antiguas estan al principio)."""
+        while self._libres:
+            entrada = next(iter(self._libres.values()))
+            if ahora - entrada.ultimo_uso <= self.inactividad:
+                break
+            self._libres.popitem(last=False)
+            self._total -= 1
+            entrada.conexion.close()
+
+    def _entregar(self, entrada):
+        """Con el cerrojo tomado: da la conexion al primer hilo en espera o la deja libre."""
+        entrada.ultimo_uso = time.monotonic()
+        if self._esperas:
+            espera = self._esperas.popleft()
+            espera.entrada = entrada
+            espera.condicion.notify()
+        else:
+            self._libres[entrada.clave] = entrada
+            self._expirar(entrada.ultimo_uso)
+
+    def _liberar_plaza(self):
+        """Con el cerrojo tomado: una conexion se ha cerrado; el primer hilo en espera puede abrir otra."""
+        if self._esperas:
+            espera = self._esperas.popleft()
+            espera.abrir = True
+            espera.condicion.notify()
+        else:
+            self._total -= 1
+
+    def _drenar(self):
+        """Con el cerrojo tomado: procesa las devoluciones que dejaron los finalizadores."""
+        while self._diferidas:
+            self._recibir(self._diferidas.popleft())
+
+    def _sacar(self):
+        """Entrega una conexion sana del pool, abriendo una nueva si hace falta y se puede."""
+        with self._cerrojo:
+            self._drenar()
+            if self.cerrado:
+                raise RuntimeError("El pool de conexiones esta cerrado.")
+            ahora = time.monotonic()
+            self._expirar(ahora)
+            if self._libres:
+                entrada = self._libres.pop(getattr(self._hilo, "clave", None), None)
+                if entrada is None:
+                    _, entrada = self._libres.popitem()
+            elif self._total < self.maximo:
+                self._total += 1
+                entrada = None
+            else:
+                espera = _Espera(self._cerrojo)
+                self._esperas.append(espera)
+                limite = ahora + self.espera
+                while espera.entrada is None and not espera.abrir:
+                    restante = limite - time.monotonic()
+                    if self.cerrado or restante <= 0:
+                        self._esperas.remove(espera)
+                        if self.cerrado:
+                            raise RuntimeError("El pool de conexiones esta cerrado.")
+                        raise TimeoutError(f"No hay conexiones libres a '{self.nombre_bd}' tras {self.espera} s.")
+                    # a tramos: una devolucion diferida no avisa a nadie
+                    espera.condicion.wait(min(restante, 0.1))
+                    self._drenar()
+                entrada = espera.entrada
+                ahora = time.monotonic()
+        try:
+            if entrada is None:
+                entrada = self._abrir()
+            elif ahora - entrada.ultimo_uso > self.verificar_tras and not self._sana(entrada):
+                entrada.conexion.close()
+                entrada = self._abrir()
+        except BaseException:
+            with self._cerrojo:
+                self._liberar_plaza()
+                self._drenar()
+            raise
+        self._hilo.clave = entrada.clave
+        return entrada
+
+    @staticmethod
+    def _sana(entrada):
+        try:
+            entrada.conexion.execute("SELECT 1").fetchall()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _recibir(self, entrada):
+        """Con el cerrojo tomado: deja libre una conexion devuelta, deshaciendo una transaccion abierta."""
+        sana = True
+        try:
+            if entrada.conexion.in_transaction:
+                entrada.conexion.rollback()
+        except sqlite3.Error:
+            sana = False
+        if self.cerrado:
+            self._total -= 1
+        elif sana:
+            self._entregar(entrada)
+            return
+        else:
+            self._liberar_plaza()
+        entrada.conexion.close()
+
+    def _devolver(self, entrada):
+        """Devuelve una conexion al pool (cerrar_conexion)."""
+        with self._cerrojo:
+            self._recibir(entrada)
+            self._drenar()
+
+    def _devolver_diferido(self, entrada):
+        """
+        Devolucion desde el finalizador de una ConexionBaseDatos perdida. El
+        recolector puede ejecutarlo en un hilo que ya tiene el cerrojo (en
+        cualquier reserva de memoria dentro del pool), asi que no espera por el:
+        deja la conexion en una cola y solo la procesa si el cerrojo esta libre;
+        si no, lo hace quien lo tenga al soltarlo.
+        """
+        self._diferidas.append(entrada)
+        if self._cerrojo.acquire(blocking=False):
+            try:
+                self._drenar()
+            finally:
+                self._cerrojo.release()
+
+    def conexion(self, verboso=False):
+        """
+        Conexion del pool para usar con `with`: al salir del bloque vuelve al pool.
+        """
+        return ConexionBaseDatos(self.nombre_bd, pool=self, verboso=verboso)
+
+    def cerrar(self):
+        """
+        Cierra las conexiones libres; las que estan en uso se cierran al devolverse.
+        """
+        with self._cerrojo:
+            self.cerrado = True
+            while self._libres:
+                _, entrada = self._libres.popitem()
+                self._total -= 1
+                entrada.conexion.close()
+            self._drenar()
+            for espera in self._esperas:
+                espera.condicion.notify()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.cerrar()
+
+
 class ConexionBaseDatos:
-    def __init__(self, nombre_bd):
+    def __init__(self, nombre_bd, pool=None, verboso=True):
         """
         Constructor que se ejecuta automaticamente al crear una instancia de la clase.
-        Inicializa la conexion a la base de datos (simulada).
+        La conexion sqlite3 no se abre aqui sino al usarla (conectar, la primera
+        consulta o un bloque `with`). Si se indica un pool, la conexion se toma
+        de el y al cerrarla vuelve al pool en lugar de cerrarse.
         """
         self.nombre_bd = nombre_bd
+        self.pool = pool
+        self.verboso = verboso
         self.conectado = False
-        self.conectar()
+        self._conexion = None
+        self._entrada = None
+        self._finalizador = None
+
+    def _avisar(self, mensaje):
+        if self.verboso:
+            print(mensaje)
 
     def conectar(self):
         """
-        Metodo que simula la conexion a una base de datos.
+        Metodo que abre la conexion a la base de datos (o la toma del pool).
         """
-        print(f"Conectando a la base de datos '{self.nombre_bd}'...")
+        if self.conectado:
+            return
+        self._avisar(f"Conectando a la base de datos '{self.nombre_bd}'...")
+        # weakref.finalize cierra (o devuelve al pool) la conexion si el objeto se
+        # pierde sin cerrar_conexion, tambien dentro de ciclos de referencias; no
+        # guarda una referencia a self, asi que no retrasa su recoleccion.
+        if self.pool is not None:
+            entrada = self.pool._sacar()
+            self._conexion = entrada.conexion
+            self._entrada = entrada
+            self._finalizador = weakref.finalize(self, self.pool._devolver_diferido, entrada)
+        else:
+            self._conexion = sqlite3.connect(self.nombre_bd, isolation_level=None, check_same_thread=False)
+            self._finalizador = weakref.finalize(self, self._conexion.close)
         self.conectado = True
-        print("Conexion establecida.")
+        self._avisar("Conexion establecida.")
 
-    def ejecutar_consulta(self, consulta):
+    def ejecutar_consulta(self, consulta, parametros=()):
         """
-        Simula la ejecucion de una consulta en la base de datos.
+        Ejecuta una consulta (conectando antes si hace falta) y devuelve sus filas.
         """
-        if self.conectado:
-            print(f"Ejecutando consulta: {consulta}")
-        else:
-            print("No se puede ejecutar la consulta. No hay conexion.")
+        if not self.conectado:
+            self.conectar()
+        self._avisar(f"Ejecutando consulta: {consulta}")
+        return self._conexion.execute(consulta, parametros).fetchall()
 
     def cerrar_conexion(self):
         """
-        Metodo que simula el cierre de la conexion a la base de datos.
+        Metodo que cierra la conexion con la base de datos, o la devuelve al pool.
         """
         if self.conectado:
-            print(f"Cerrando conexion con la base de datos '{self.nombre_bd}'...")
+            self._avisar(f"Cerrando conexion con la base de datos '{self.nombre_bd}'...")
+            if self.pool is not None and self._finalizador.detach() is not None:
+                self.pool._devolver(self._entrada)
+            else:
+                self._finalizador()  # solo actua la primera vez
+            self._conexion = None
+            self._entrada = None
             self.conectado = False
-            print("Conexion cerrada.")
+            self._avisar("Conexion cerrada.")
 
-    def __del__(self):
-        """
-        Destructor que se ejecuta automaticamente cuando el objeto se elimina o el programa termina.
-        Libera recursos, como cerrar conexiones abiertas.
-        """
-        print("Destructor invocado...")
+    def __enter__(self):
+        self.conectar()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
         self.cerrar_conexion()
 
 
+def benchmark_pool(hilos=32, consultas=10_000, maximo=8):
+    """
+    `consultas` consultas cortas repartidas entre `hilos` hilos sobre una base
+    de datos temporal: abriendo una conexion por consulta y tomandola del pool.
+    """
+    directorio = tempfile.mkdtemp()
+    ruta = os.path.join(directorio, "benchmark.db")
+    with ConexionBaseDatos(ruta, verboso=False) as conexion:
+        conexion.ejecutar_consulta("CREATE TABLE usuarios (id INTEGER PRIMARY KEY, nombre TEXT)")
+        conexion.ejecutar_consulta("BEGIN")
+        for i in range(1000):
+            conexion.ejecutar_consulta("INSERT INTO usuarios VALUES (?, ?)", (i, f"usuario {i}"))
+        conexion.ejecutar_consulta("COMMIT")
+
+    def por_llamada(i):
+        with ConexionBaseDatos(ruta, verboso=False) as conexion:
+            return conexion.ejecutar_consulta("SELECT nombre FROM usuarios WHERE id = ?", (i % 1000,))
+
+    pool = PoolConexiones(ruta, maximo=maximo)
+
+    def con_pool(i):
+        with pool.conexion() as conexion:
+            return conexion.ejecutar_consulta("SELECT nombre FROM usuarios WHERE id = ?", (i % 1000,))
+
+    print(f"[BENCH] {consultas:,} consultas desde {hilos} hilos (pool de {maximo} conexiones)")
+    for nombre, consultar in (("por llamada", por_llamada), ("pool", con_pool)):
+        latencias = [[] for _ in range(hilos)]
+
+        def trabajador(k):
+            for i in range(k, consultas, hilos):
+                t0 = time.perf_counter()
+                consultar(i)
+                latencias[k].append(time.perf_counter() - t0)
+
+        trabajadores = [threading.Thread(target=trabajador, args=(k,)) for k in range(hilos)]
+        inicio = time.perf_counter()
+        for t in trabajadores:
+            t.start()
+        for t in trabajadores:
+            t.join()
+        total = time.perf_counter() - inicio
+        todas = sorted(itertools.chain.from_iterable(latencias))
+        print(f"[BENCH] {nombre:<11}: {consultas / total:10,.0f} consultas/s  "
+              f"p50 {todas[len(todas) // 2] * 1e6:8.1f} us  p99 {todas[int(0.99 * (len(todas) - 1))] * 1e6:8.1f} us")
+    pool.cerrar()
+    os.remove(ruta)
+    os.rmdir(directorio)
+
+
 # Bloque principal de prueba
 if __name__ == "__main__":
-    print("Inicio del programa")
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        benchmark_pool()
+        sys.exit()
 
-    # Crear una instancia de la clase
-    conexion = ConexionBaseDatos("clientes.db")
+    print("Inicio del programa")
 
-    # Usar el objeto
-    conexion.ejecutar_consulta("SELECT * FROM usuarios")
+    # El bloque with abre la conexion y la cierra al salir, aunque haya errores
+    with ConexionBaseDatos(":memory:") as conexion:
+        conexion.ejecutar_consulta("CREATE TABLE usuarios (id INTEGER PRIMARY KEY, nombre TEXT)")
+        conexion.ejecutar_consulta("INSERT INTO usuarios (nombre) VALUES (?)", ("Ana",))
+        print(conexion.ejecutar_consulta("SELECT * FROM usuarios"))
 
-    # Eliminar explicitamente el objeto (opcional, para ver el destructor en accion)
-    del conexion
+    # Con un pool, cerrar la conexion la devuelve para reutilizarla
+    with PoolConexiones(":memory:", maximo=2) as pool:
+        with pool.conexion(verboso=True) as conexion:
+            print(conexion.ejecutar_consulta("SELECT sqlite_version()"))
 
     print("Fin del programa")
@@ -7,26 +7,491 @@ Sistema de Gestión de Inventarios (con archivos y manejo de excepciones)
 - Interfaz de consola con mensajes claros de éxito/fracaso.
 - Escrituras atómicas (archivo temporal + os.replace) para reducir corrupción.
 - Incluye una opción de prueba para inyectar una línea corrupta en el archivo.
+- Lotes transaccionales (`with inv.lote(): ...`) y operaciones masivas que
+  aplican los cambios en memoria y guardan una sola vez al confirmar.
+- Carga perezosa opcional: mapea el archivo en memoria (mmap), indexa solo
+  id -> desplazamiento y analiza cada fila la primera vez que se accede.
+- Carga paralela opcional: divide el CSV en rangos de bytes alineados a línea
+  y los analiza en un ProcessPoolExecutor (misma validación, gana la última fila).
+- Almacén columnar opcional: ids/cantidades/precios en arrays tipados y
+  nombres en una tabla de cadenas únicas, en lugar de un dict por producto.
+- Consultas por rango de cantidad/precio y prefijo de nombre (`consultar`)
+  respaldadas por índices secundarios ordenados, en O(log n + k).
+- Instantánea binaria opcional ("<archivo>.bin"): registros de ancho fijo y
+  un montón de cadenas, leída con mmap casi sin análisis al arrancar.
+- Modo compartido opcional para varios procesos sobre el mismo archivo:
+  cerrojos consultivos (fcntl) en "<archivo>.lock" alrededor de cada ciclo
+  leer-modificar-escribir, y recarga solo cuando otro proceso confirmó
+  cambios (incremental si solo creció el journal).
+- Las filas inválidas se resumen en un único aviso al terminar la carga.
+- Modo journal opcional: cada cambio se añade como un registro pequeño a
+  "<archivo>.log" en lugar de reescribir todo el CSV; la compactación vuelca
+  el journal en una nueva instantánea atómica.
 
 Formato del archivo (CSV UTF-8 con encabezados):
     id,nombre,cantidad,precio
 
+Formato del journal (CSV UTF-8 sin encabezados, un cambio por línea):
+    U,id,nombre,cantidad,precio   -> alta o modificación (registro completo)
+    D,id                          -> baja
+
+Formato de la instantánea binaria (little-endian, versión 1):
+    cabecera: magia "INVB", versión, nº registros, último ID,
+              tamaño y mtime_ns del CSV del que es copia
+    registros de 32 bytes: id, cantidad, precio, desplazamiento y longitud
+                           (en caracteres) del nombre dentro del montón
+    montón: nombres concatenados, en UTF-8
+Solo se usa si coincide con el tamaño y mtime actuales del CSV; si no, se lee
+el CSV. csv_a_binario() y binario_a_csv() convierten entre ambos formatos.
+
 Ejecutar:
     python inventario_archivos.py
+    python inventario_archivos.py --benchmark carga   # carga secuencial vs paralela
+    python inventario_archivos.py --benchmark memoria # dict de dicts vs columnar
+    python inventario_archivos.py --benchmark arranque # CSV vs instantánea binaria
 """
 import csv
+import functools
+import io
+import math
+import mmap
 import os
-from typing import Dict, List, Optional
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin cerrojos consultivos
+    fcntl = None
 
 CAMPOS = ["id", "nombre", "cantidad", "precio"]
+OP_ALTA = "U"
+OP_BAJA = "D"
+
+
+MAGIA_BINARIA = b"INVB"
+VERSION_BINARIA = 1
+# magia, versión, nº de registros, último ID, tamaño y mtime_ns del CSV de origen
+CABECERA_BINARIA = struct.Struct("<4sH2xqqqq")
+# id, cantidad, precio, desplazamiento y longitud (en caracteres) del nombre en el montón
+REGISTRO_BINARIO = struct.Struct("<qqdII")
+
+
+def _fila_a_producto(id_: int, nombre: str, cantidad: str, precio: str) -> Dict:
+    return {"id": id_, "nombre": nombre, "cantidad": int(cantidad), "precio": float(precio)}
+
+
+def _leer_csv(ruta: str, errores: "ResumenErrores") -> Iterator[Dict]:
+    with open(ruta, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        for fila in reader:
+            try:
+                id_ = int(fila["id"])
+                yield _fila_a_producto(id_, fila["nombre"], fila["cantidad"], fila["precio"])
+            except Exception:
+                errores.registrar(f"línea {reader.line_num}")
+
+
+def escribir_binario(ruta: str, productos: Iterable[Dict], ultimo_id: int,
+                     origen: os.stat_result) -> None:
+    """Escribe la instantánea binaria de forma atómica (temporal + os.replace)."""
+    registros = bytearray()
+    nombres: List[str] = []
+    desplazamiento = 0
+    for p in productos:
+        nombre = p["nombre"]
+        registros += REGISTRO_BINARIO.pack(p["id"], p["cantidad"], p["precio"], desplazamiento, len(nombre))
+        nombres.append(nombre)
+        desplazamiento += len(nombre)
+    n = len(nombres)
+    cabecera = CABECERA_BINARIA.pack(MAGIA_BINARIA, VERSION_BINARIA, n, ultimo_id,
+                                     origen.st_size, origen.st_mtime_ns)
+    tmp = ruta + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(cabecera)
+        f.write(registros)
+        f.write("".join(nombres).encode("utf-8"))
+    os.replace(tmp, ruta)
+
+
+def cabecera_binaria(ruta: str) -> Optional[Tuple[int, int, int, int]]:
+    """(nº registros, último ID, tamaño CSV, mtime_ns CSV) o None si no es válida."""
+    try:
+        with open(ruta, "rb") as f:
+            datos = f.read(CABECERA_BINARIA.size)
+    except OSError:
+        return None
+    if len(datos) < CABECERA_BINARIA.size:
+        return None
+    magia, version, *resto = CABECERA_BINARIA.unpack(datos)
+    if magia != MAGIA_BINARIA or version != VERSION_BINARIA:
+        return None
+    return tuple(resto)
+
+
+def leer_binario(ruta: str) -> Iterator[Dict]:
+    with open(ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+        magia, version, n, *_ = CABECERA_BINARIA.unpack_from(mapa)
+        if magia != MAGIA_BINARIA or version != VERSION_BINARIA:
+            raise ValueError(f"'{ruta}' no es una instantánea binaria v{VERSION_BINARIA}")
+        inicio = CABECERA_BINARIA.size
+        base = inicio + n * REGISTRO_BINARIO.size
+        monton = mapa[base:].decode("utf-8")
+        for id_, cantidad, precio, desp, largo in REGISTRO_BINARIO.iter_unpack(mapa[inicio:base]):
+            yield {"id": id_, "nombre": monton[desp:desp + largo],
+                   "cantidad": cantidad, "precio": precio}
+
+
+def csv_a_binario(ruta_csv: str, ruta_bin: Optional[str] = None) -> "ResumenErrores":
+    """Genera la instantánea binaria de un CSV. Devuelve el resumen de filas omitidas."""
+    errores = ResumenErrores()
+    productos = {p["id"]: p for p in _leer_csv(ruta_csv, errores)}
+    escribir_binario(ruta_bin or ruta_csv + ".bin", productos.values(),
+                     max(productos, default=0), os.stat(ruta_csv))
+    return errores
+
+
+def binario_a_csv(ruta_bin: str, ruta_csv: str) -> None:
+    tmp = ruta_csv + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CAMPOS)
+        writer.writeheader()
+        writer.writerows(leer_binario(ruta_bin))
+    os.replace(tmp, ruta_csv)
+
+
+def _parsear_rango(ruta: str, inicio: int, fin: int) -> Tuple[List[Tuple], List[int], int, int]:
+    """
+    Analiza las filas del rango [inicio, fin) en un proceso trabajador.
+    Devuelve tuplas compactas (id, nombre, cantidad, precio), las líneas
+    inválidas (relativas al rango), el número de saltos de línea y de comillas.
+    """
+    with open(ruta, "rb") as f:
+        f.seek(inicio)
+        datos = f.read(fin - inicio)
+    lector = csv.reader(io.StringIO(datos.decode("utf-8"), newline=""))
+    filas: List[Tuple] = []
+    errores: List[int] = []
+    for fila in lector:
+        if not fila:
+            continue
+        try:
+            filas.append((int(fila[0]), fila[1], int(fila[2]), float(fila[3])))
+        except (IndexError, ValueError):
+            errores.append(lector.line_num)
+    return filas, errores, datos.count(b"\n"), datos.count(b'"')
+
+
+class ResumenErrores:
+    """Cuenta las filas inválidas y recuerda solo las primeras ubicaciones."""
+    MAX_UBICACIONES = 10
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.ubicaciones: List[str] = []
+
+    def registrar(self, ubicacion: str) -> None:
+        self.total += 1
+        if len(self.ubicaciones) < self.MAX_UBICACIONES:
+            self.ubicaciones.append(ubicacion)
+
+    def __bool__(self) -> bool:
+        return self.total > 0
+
+    def __str__(self) -> str:
+        extra = ", ..." if self.total > len(self.ubicaciones) else ""
+        return f"{self.total} filas inválidas omitidas ({', '.join(self.ubicaciones)}{extra})"
+
+
+class ProductosPerezosos(MutableMapping):
+    """
+    Diccionario id -> producto respaldado por un mmap del CSV.
+    Al abrir solo se recorre el archivo para anotar id -> desplazamiento del
+    registro; cada fila se analiza (y se guarda) la primera vez que se pide.
+    """
+
+    def __init__(self, ruta: str, errores: ResumenErrores) -> None:
+        # Valor int = desplazamiento aún sin analizar; valor dict = producto.
+        self._filas: Dict[int, Union[int, Dict]] = {}
+        self._errores = errores
+        self._archivo = open(ruta, "rb")
+        self._mapa: Optional[mmap.mmap] = None
+        self.id_maximo = 0
+        if os.fstat(self._archivo.fileno()).st_size:
+            self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+            self._indexar()
+
+    def _fin_registro(self, inicio: int) -> int:
+        """Fin del registro que empieza en `inicio` (salta saltos de línea entre comillas)."""
+        mapa = self._mapa
+        fin = mapa.find(b"\n", inicio)
+        fin = len(mapa) if fin == -1 else fin + 1
+        while mapa[inicio:fin].count(b'"') % 2 and fin < len(mapa):
+            siguiente = mapa.find(b"\n", fin)
+            fin = len(mapa) if siguiente == -1 else siguiente + 1
+        return fin
+
+    def _indexar(self) -> None:
+        mapa = self._mapa
+        fin = self._fin_registro(0)
+        if mapa[:fin].decode("utf-8").strip() != ",".join(CAMPOS):
+            self.cerrar()
+            raise ValueError("encabezado distinto de " + ",".join(CAMPOS))
+        linea = 1
+        while fin < len(mapa):
+            inicio, fin = fin, self._fin_registro(fin)
+            linea += 1
+            coma = mapa.find(b",", inicio, fin)
+            try:
+                id_ = int(mapa[inicio:coma if coma != -1 else fin])
+            except ValueError:
+                if mapa[inicio:fin].strip():
+                    self._errores.registrar(f"línea {linea}")
+                continue
+            self._filas[id_] = inicio  # como en la carga normal, gana la última fila
+            if id_ > self.id_maximo:
+                self.id_maximo = id_
+
+    def _analizar(self, id_: int, inicio: int) -> Dict:
+        texto = self._mapa[inicio:self._fin_registro(inicio)].decode("utf-8")
+        fila = next(csv.reader(io.StringIO(texto, newline="")))
+        return _fila_a_producto(id_, fila[1], fila[2], fila[3])
+
+    def __getitem__(self, id_: int) -> Dict:
+        valor = self._filas[id_]
+        if isinstance(valor, int):
+            try:
+                valor = self._analizar(id_, valor)
+            except (IndexError, ValueError, UnicodeDecodeError):
+                del self._filas[id_]
+                self._errores.registrar(f"byte {valor}")
+                raise KeyError(id_) from None
+            self._filas[id_] = valor
+        return valor
+
+    def __setitem__(self, id_: int, producto: Dict) -> None:
+        self._filas[id_] = producto
+
+    def __delitem__(self, id_: int) -> None:
+        del self._filas[id_]
+
+    def __contains__(self, id_: object) -> bool:
+        try:
+            self[id_]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[int]:
+        for id_ in list(self._filas):
+            if id_ in self:
+                yield id_
+
+    def __len__(self) -> int:
+        # Las filas aún sin analizar cuentan aunque luego resulten inválidas.
+        return len(self._filas)
+
+    def clear(self) -> None:
+        self._filas.clear()
+        self.cerrar()
+
+    def soltar_archivo(self) -> None:
+        """Analiza lo pendiente y libera el mmap (p. ej. antes de reemplazar el archivo)."""
+        for _ in self:
+            pass
+        self.cerrar()
+
+    def cerrar(self) -> None:
+        if self._mapa is not None:
+            self._mapa.close()
+            self._mapa = None
+        self._archivo.close()
+
+
+class AlmacenColumnar(MutableMapping):
+    """
+    Diccionario id -> producto guardado por columnas: ids y cantidades en
+    array('q'), precios en array('d') y cada nombre como índice a una tabla de
+    cadenas únicas. Cada acceso devuelve un dict nuevo: para modificar un
+    producto hay que reasignarlo (almacen[id] = {...}).
+    """
+
+    def __init__(self) -> None:
+        self._fila: Dict[int, int] = {}  # id -> fila; su orden es el de inserción
+        self._ids = array("q")
+        self._cantidades = array("q")
+        self._precios = array("d")
+        self._nombres = array("I")
+        self._tabla: List[str] = []
+        self._indice_tabla: Dict[str, int] = {}
+
+    def _indice_nombre(self, nombre: str) -> int:
+        indice = self._indice_tabla.get(nombre)
+        if indice is None:
+            indice = self._indice_tabla[nombre] = len(self._tabla)
+            self._tabla.append(nombre)
+        return indice
+
+    def __getitem__(self, id_: int) -> Dict:
+        fila = self._fila[id_]
+        return {
+            "id": id_,
+            "nombre": self._tabla[self._nombres[fila]],
+            "cantidad": self._cantidades[fila],
+            "precio": self._precios[fila],
+        }
+
+    def __setitem__(self, id_: int, producto: Dict) -> None:
+        nombre = self._indice_nombre(producto["nombre"])
+        fila = self._fila.get(id_)
+        if fila is None:
+            self._fila[id_] = len(self._ids)
+            self._ids.append(id_)
+            self._nombres.append(nombre)
+            self._cantidades.append(producto["cantidad"])
+            self._precios.append(producto["precio"])
+        else:
+            self._nombres[fila] = nombre
+            self._cantidades[fila] = producto["cantidad"]
+            self._precios[fila] = producto["precio"]
+
+    def __delitem__(self, id_: int) -> None:
+        # La última fila ocupa el hueco para que el borrado sea O(1).
+        fila = self._fila.pop(id_)
+        ultima = len(self._ids) - 1
+        if fila != ultima:
+            id_movido = self._ids[ultima]
+            self._fila[id_movido] = fila
+            for columna in (self._ids, self._nombres, self._cantidades, self._precios):
+                columna[fila] = columna[ultima]
+        for columna in (self._ids, self._nombres, self._cantidades, self._precios):
+            columna.pop()
+
+    def __contains__(self, id_: object) -> bool:
+        return id_ in self._fila
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._fila)
+
+    def __len__(self) -> int:
+        return len(self._fila)
+
+    def clear(self) -> None:
+        self.__init__()
+
+
+class IndicesSecundarios:
+    """
+    Listas ordenadas de pares (valor, id) sobre cantidad, precio y nombre en
+    minúsculas. Los rangos y prefijos se localizan con bisect en O(log n); las
+    altas y bajas mantienen el orden con insort/del.
+    """
+    CAMPOS = ("cantidad", "precio", "nombre")
+
+    def __init__(self, productos: Iterable[Dict]) -> None:
+        self.listas: Dict[str, List[Tuple]] = {campo: [] for campo in self.CAMPOS}
+        for p in productos:
+            for campo, clave in self._claves(p):
+                self.listas[campo].append(clave)
+        for lista in self.listas.values():
+            lista.sort()
+
+    @staticmethod
+    def _claves(p: Dict) -> Iterator[Tuple[str, Tuple]]:
+        yield "cantidad", (p["cantidad"], p["id"])
+        yield "precio", (p["precio"], p["id"])
+        yield "nombre", (p["nombre"].lower(), p["id"])
+
+    def agregar(self, p: Dict) -> None:
+        for campo, clave in self._claves(p):
+            insort(self.listas[campo], clave)
+
+    def quitar(self, p: Dict) -> None:
+        for campo, clave in self._claves(p):
+            lista = self.listas[campo]
+            i = bisect_left(lista, clave)
+            if i < len(lista) and lista[i] == clave:
+                del lista[i]
+
+    def rango(self, campo: str, minimo=None, maximo=None) -> Tuple[int, int]:
+        """Posiciones [inicio, fin) de los valores entre minimo y maximo (inclusive)."""
+        lista = self.listas[campo]
+        inicio = 0 if minimo is None else bisect_left(lista, (minimo,))
+        fin = len(lista) if maximo is None else bisect_right(lista, (maximo, math.inf))
+        return inicio, max(inicio, fin)
+
+    def prefijo(self, texto: str) -> Tuple[int, int]:
+        lista = self.listas["nombre"]
+        texto = texto.lower()
+        return bisect_left(lista, (texto,)), bisect_left(lista, (texto + "\U0010ffff",))
+
+
+def _con_cerrojo(exclusivo: bool = True) -> Callable:
+    """Ejecuta el método dentro de la sección crítica del modo compartido."""
+    def decorador(metodo: Callable) -> Callable:
+        @functools.wraps(metodo)
+        def envoltura(self: "Inventario", *args, **kwargs):
+            with self._seccion_critica(exclusivo):
+                return metodo(self, *args, **kwargs)
+        return envoltura
+    return decorador
 
 
 class Inventario:
-    def __init__(self, ruta_archivo: str = "inventario.txt") -> None:
+    def __init__(self, ruta_archivo: str = "inventario.txt", journal: bool = False,
+                 umbral_compactacion: int = 1000, perezoso: bool = False,
+                 paralelo: bool = False, procesos: Optional[int] = None,
+                 columnar: bool = False, binario: bool = False,
+                 compartido: bool = False) -> None:
         self.ruta = ruta_archivo
-        self.productos: Dict[int, Dict] = {}
+        self.ruta_binaria = ruta_archivo + ".bin"
+        # Con binario=True cada guardado completo escribe también la instantánea
+        # binaria, y la carga la prefiere mientras siga correspondiendo al CSV.
+        self.binario = binario
+        # El almacén columnar no aplica a la carga perezosa, que guarda su propia caché.
+        self.columnar = columnar
+        self.perezoso = perezoso
+        self.paralelo = paralelo
+        self.procesos = procesos
+        self.errores_carga = ResumenErrores()
+        self.ruta_journal = ruta_archivo + ".log"
+        # En modo journal las mutaciones se anexan al log y solo se reescribe
+        # el CSV completo al compactar (al superar el umbral o explícitamente).
+        self.journal = journal
+        self.umbral_compactacion = umbral_compactacion
+        self._entradas_journal = 0
+        self.productos: MutableMapping[int, Dict] = self._nuevo_almacen()
+        # Contador de IDs mantenido (evita recalcular max() en cada alta).
+        self._ultimo_id = 0
+        # Estado del lote en curso: profundidad de anidamiento y valores
+        # previos de cada ID tocado (None si no existía) para deshacer.
+        self._profundidad_lote = 0
+        self._deshacer: Dict[int, Optional[Dict]] = {}
+        # Índices para consultar(); se construyen en la primera consulta.
+        self._indices: Optional[IndicesSecundarios] = None
+        # Modo compartido: firma (inodo, tamaño, mtime) del CSV cargado y bytes
+        # del journal ya aplicados, para detectar cambios de otros procesos.
+        self.compartido = compartido
+        self.ruta_cerrojo = ruta_archivo + ".lock"
+        self._en_seccion = False
+        self._firma_csv: Optional[Tuple[int, int, int]] = None
+        self._pos_journal = 0
+        if compartido and fcntl is None:
+            print("[ADVERTENCIA] fcntl no disponible: el modo compartido no bloqueará el archivo.")
         self._crear_archivo_si_no_existe()
-        self.cargar_desde_archivo()
+        if compartido:
+            self.refrescar()
+        else:
+            self.cargar_desde_archivo()
 
     def _crear_archivo_si_no_existe(self) -> None:
         try:
@@ -39,27 +504,187 @@ class Inventario:
         except PermissionError as e:
             print(f"[ERROR] Sin permisos para crear '{self.ruta}': {e}")
 
+    def _nuevo_almacen(self) -> MutableMapping:
+        return AlmacenColumnar() if self.columnar else {}
+
+    # ------------------------- Modo compartido ------------------------- #
+
+    @contextmanager
+    def _seccion_critica(self, exclusiva: bool = True) -> Iterator[None]:
+        """
+        En modo compartido toma el cerrojo (exclusivo para escribir, compartido
+        para leer) y antes de continuar incorpora los cambios de otros procesos.
+        Es reentrante: las llamadas anidadas usan el cerrojo ya tomado.
+        """
+        if not self.compartido or self._en_seccion:
+            yield
+            return
+        with open(self.ruta_cerrojo, "ab") as cerrojo:
+            if fcntl is not None:
+                fcntl.flock(cerrojo, fcntl.LOCK_EX if exclusiva else fcntl.LOCK_SH)
+            self._en_seccion = True
+            try:
+                self._refrescar_si_cambio()
+                yield
+            finally:
+                self._en_seccion = False
+                if fcntl is not None:
+                    fcntl.flock(cerrojo, fcntl.LOCK_UN)
+
+    def _firma_archivo(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            estado = os.stat(self.ruta)
+        except FileNotFoundError:
+            return None
+        return estado.st_ino, estado.st_size, estado.st_mtime_ns
+
+    def _refrescar_si_cambio(self) -> None:
+        if self._firma_archivo() != self._firma_csv:
+            # Otro proceso reescribió la instantánea: recarga completa.
+            self.cargar_desde_archivo()
+            return
+        try:
+            tamano = os.path.getsize(self.ruta_journal)
+        except FileNotFoundError:
+            tamano = 0
+        if tamano < self._pos_journal:
+            self.cargar_desde_archivo()
+        elif tamano > self._pos_journal:
+            # Solo creció el journal: se aplican únicamente los registros nuevos.
+            self._reproducir_journal(desde=self._pos_journal)
+            self._indices = None
+
+    def refrescar(self) -> None:
+        """Incorpora los cambios confirmados por otros procesos (modo compartido)."""
+        with self._seccion_critica(exclusiva=False):
+            pass
+
+    # ----------------------------- Carga ----------------------------- #
+
     def cargar_desde_archivo(self) -> None:
         self.productos.clear()
+        self._indices = None
+        self._firma_csv = self._firma_archivo()
+        self.errores_carga = ResumenErrores()
         try:
-            with open(self.ruta, "r", encoding="utf-8", newline="") as f:
-                reader = csv.DictReader(f)
-                for fila in reader:
-                    try:
-                        id_ = int(fila["id"])
-                        self.productos[id_] = {
-                            "id": id_,
-                            "nombre": fila["nombre"],
-                            "cantidad": int(fila["cantidad"]),
-                            "precio": float(fila["precio"]),
-                        }
-                    except Exception:
-                        print("[ADVERTENCIA] Línea inválida en el archivo. Se omitió.")
-                print(f"[OK] Cargados {len(self.productos)} productos.")
+            if self.perezoso:
+                self._cargar_perezoso()
+            elif self.binario and self._cargar_binario():
+                pass
+            elif self.paralelo:
+                self._cargar_paralelo()
+            else:
+                self._cargar_csv()
         except FileNotFoundError:
             print(f"[INFO] Archivo '{self.ruta}' no encontrado. Se creará al guardar.")
         except PermissionError as e:
             print(f"[ERROR] Sin permisos para leer '{self.ruta}': {e}")
+        if self.errores_carga:
+            print(f"[ADVERTENCIA] {self.ruta}: {self.errores_carga}.")
+        self._reproducir_journal()
+        print(f"[OK] Cargados {len(self.productos)} productos.")
+
+    def _cargar_csv(self) -> None:
+        self.productos = self._nuevo_almacen()
+        for p in _leer_csv(self.ruta, self.errores_carga):
+            self.productos[p["id"]] = p
+        self._ultimo_id = max(self.productos, default=0)
+
+    def _cargar_binario(self) -> bool:
+        """Carga la instantánea binaria si corresponde al CSV actual."""
+        cabecera = cabecera_binaria(self.ruta_binaria)
+        if cabecera is None:
+            return False
+        _, ultimo_id, tamano, mtime_ns = cabecera
+        estado = os.stat(self.ruta)
+        if (tamano, mtime_ns) != (estado.st_size, estado.st_mtime_ns):
+            return False
+        self.productos = self._nuevo_almacen()
+        for p in leer_binario(self.ruta_binaria):
+            self.productos[p["id"]] = p
+        self._ultimo_id = ultimo_id
+        return True
+
+    def _cargar_paralelo(self) -> None:
+        procesos = self.procesos or os.cpu_count() or 1
+        with open(self.ruta, "rb") as f:
+            encabezado = f.readline()
+            tamano = os.fstat(f.fileno()).st_size
+            if (procesos < 2 or tamano < 1 << 20
+                    or encabezado.decode("utf-8").strip() != ",".join(CAMPOS)):
+                self._cargar_csv()
+                return
+            # Varios rangos por proceso para repartir mejor la carga.
+            limites = [len(encabezado)]
+            paso = max((tamano - len(encabezado)) // (procesos * 4), 1)
+            while limites[-1] + paso < tamano:
+                f.seek(limites[-1] + paso)
+                f.readline()
+                if f.tell() >= tamano:
+                    break
+                limites.append(f.tell())
+            limites.append(tamano)
+        with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+            resultados = list(ejecutor.map(
+                _parsear_rango, [self.ruta] * (len(limites) - 1), limites[:-1], limites[1:]))
+        # Un rango con comillas impares cortó un campo con saltos de línea.
+        if any(comillas % 2 for _, _, _, comillas in resultados):
+            self._cargar_csv()
+            return
+        self.productos = self._nuevo_almacen()
+        linea_base = 1
+        for filas, errores, saltos, _ in resultados:
+            for id_, nombre, cantidad, precio in filas:
+                self.productos[id_] = {"id": id_, "nombre": nombre, "cantidad": cantidad, "precio": precio}
+            for linea in errores:
+                self.errores_carga.registrar(f"línea {linea_base + linea}")
+            linea_base += saltos
+        self._ultimo_id = max(self.productos, default=0)
+
+    def _cargar_perezoso(self) -> None:
+        try:
+            self.productos = ProductosPerezosos(self.ruta, self.errores_carga)
+        except ValueError as e:
+            print(f"[ADVERTENCIA] Carga perezosa no disponible ({e}); se carga completo.")
+            self._cargar_csv()
+            return
+        self._ultimo_id = self.productos.id_maximo
+
+    def _reproducir_journal(self, desde: int = 0) -> None:
+        """
+        Aplica sobre la instantánea CSV los cambios pendientes del journal, a
+        partir del byte `desde` (0 en una carga completa).
+        """
+        if not desde:
+            self._entradas_journal = 0
+            self._pos_journal = 0
+        errores = ResumenErrores()
+        try:
+            with open(self.ruta_journal, "rb") as f:
+                f.seek(desde)
+                datos = f.read()
+                self._pos_journal = desde + len(datos)
+                lector = csv.reader(io.StringIO(datos.decode("utf-8"), newline=""))
+                for fila in lector:
+                    try:
+                        op, id_ = fila[0], int(fila[1])
+                        self._ultimo_id = max(self._ultimo_id, id_)
+                        if op == OP_BAJA:
+                            self.productos.pop(id_, None)
+                        elif op == OP_ALTA:
+                            self.productos[id_] = _fila_a_producto(id_, fila[2], fila[3], fila[4])
+                        else:
+                            raise ValueError(f"operación desconocida: {op!r}")
+                    except (IndexError, ValueError):
+                        errores.registrar(f"línea {lector.line_num}")
+                        continue
+                    self._entradas_journal += 1
+        except FileNotFoundError:
+            pass
+        except PermissionError as e:
+            print(f"[ERROR] Sin permisos para leer '{self.ruta_journal}': {e}")
+        if errores:
+            print(f"[ADVERTENCIA] {self.ruta_journal}: {errores}.")
 
     def _guardar_en_archivo(self) -> None:
         tmp = self.ruta + ".tmp"
@@ -69,48 +694,227 @@ class Inventario:
                 writer.writeheader()
                 for p in self.productos.values():
                     writer.writerow(p)
+            if isinstance(self.productos, ProductosPerezosos):
+                self.productos.soltar_archivo()
             os.replace(tmp, self.ruta)
+            self._firma_csv = self._firma_archivo()
+            # La instantánea ya contiene todo lo registrado en el journal.
+            self._descartar_journal()
+            if self.binario:
+                escribir_binario(self.ruta_binaria, self.productos.values(),
+                                 self._ultimo_id, os.stat(self.ruta))
             print(f"[OK] Inventario guardado en '{self.ruta}'.")
         except PermissionError as e:
             print(f"[ERROR] Sin permisos para escribir en '{self.ruta}': {e}")
 
+    def _descartar_journal(self) -> None:
+        try:
+            os.remove(self.ruta_journal)
+        except FileNotFoundError:
+            pass
+        self._entradas_journal = 0
+        self._pos_journal = 0
+        # Si el ID más alto fue eliminado, la instantánea ya no lo refleja:
+        # una baja de ese ID en el journal conserva el contador entre recargas.
+        if self.journal and self._ultimo_id > max(self.productos, default=0):
+            self._escribir_en_journal([OP_BAJA, self._ultimo_id])
+
+    def _escribir_en_journal(self, fila: List) -> bool:
+        linea = io.StringIO(newline="")
+        csv.writer(linea).writerow(fila)
+        try:
+            with open(self.ruta_journal, "ab") as f:
+                f.write(linea.getvalue().encode("utf-8"))
+                self._pos_journal = f.tell()
+        except PermissionError as e:
+            print(f"[ERROR] Sin permisos para escribir en '{self.ruta_journal}': {e}")
+            return False
+        self._entradas_journal += 1
+        return True
+
+    def _registrar_en_journal(self, op: str, id_: int) -> None:
+        if op == OP_ALTA:
+            p = self.productos[id_]
+            fila = [op, id_, p["nombre"], p["cantidad"], p["precio"]]
+        else:
+            fila = [op, id_]
+        if self._escribir_en_journal(fila) and self._entradas_journal >= self.umbral_compactacion:
+            self.compactar()
+
+    def _persistir(self, op: str, id_: int) -> None:
+        """Persiste un cambio: registro en el journal o reescritura completa."""
+        if self._profundidad_lote:
+            return  # se guarda una sola vez al confirmar el lote
+        if self.journal:
+            self._registrar_en_journal(op, id_)
+        else:
+            self._guardar_en_archivo()
+
+    @_con_cerrojo()
+    def compactar(self) -> None:
+        """Vuelca el journal en una nueva instantánea CSV atómica y lo vacía."""
+        self._guardar_en_archivo()
+
+    # ----------------------------- Lotes ----------------------------- #
+
+    @contextmanager
+    def lote(self) -> Iterator["Inventario"]:
+        """
+        Agrupa mutaciones: se aplican en memoria y se guardan con un único
+        _guardar_en_archivo al salir. Si escapa una excepción, el diccionario
+        vuelve a su estado previo y no se escribe nada. Los lotes anidados se
+        integran en el más externo.
+        """
+        if self._profundidad_lote:
+            self._profundidad_lote += 1
+            try:
+                yield self
+            finally:
+                self._profundidad_lote -= 1
+            return
+        self._deshacer = {}
+        with self._seccion_critica():
+            ultimo_id = self._ultimo_id
+            try:
+                # solo con el cerrojo tomado: si falla, las operaciones
+                # siguientes no deben quedarse en un lote que no existe
+                self._profundidad_lote = 1
+                yield self
+            except BaseException:
+                self._profundidad_lote = 0
+                for id_, anterior in self._deshacer.items():
+                    if anterior is None:
+                        self.productos.pop(id_, None)
+                    else:
+                        self.productos[id_] = anterior
+                self._ultimo_id = ultimo_id
+                self._indices = None
+                print("[ERROR] Lote revertido; no se guardaron cambios.")
+                raise
+            else:
+                self._profundidad_lote = 0
+                if self._deshacer:
+                    self._guardar_en_archivo()
+            finally:
+                self._profundidad_lote = 0
+                self._deshacer = {}
+
+    def _anotar_deshacer(self, id_: int) -> None:
+        """Guarda el valor previo de un ID la primera vez que el lote lo toca."""
+        if self._profundidad_lote and id_ not in self._deshacer:
+            previo = self.productos.get(id_)
+            self._deshacer[id_] = dict(previo) if previo is not None else None
+
+    def agregar_productos(self, productos: Iterable[Tuple[str, int, float]]) -> List[int]:
+        """Agrega (nombre, cantidad, precio) en bloque. Devuelve los IDs asignados."""
+        with self.lote():
+            return [self.agregar_producto(n, c, p) for n, c, p in productos]
+
+    def actualizar_productos(self, cambios: Mapping[int, Mapping]) -> None:
+        """Actualiza en bloque: {id: {"nombre"|"cantidad"|"precio": valor}}."""
+        with self.lote():
+            for id_, campos in cambios.items():
+                self.actualizar_producto(id_, **campos)
+
+    # ----------------------------- CRUD ----------------------------- #
+
+    def _actualizar_indices(self, anterior: Optional[Dict], nuevo: Optional[Dict]) -> None:
+        if self._indices is None:
+            return
+        if anterior is not None:
+            self._indices.quitar(anterior)
+        if nuevo is not None:
+            self._indices.agregar(nuevo)
+
     def _siguiente_id(self) -> int:
-        return max(self.productos.keys(), default=0) + 1
+        self._ultimo_id += 1
+        return self._ultimo_id
 
-    def agregar_producto(self, nombre: str, cantidad: int, precio: float) -> None:
+    @_con_cerrojo()
+    def agregar_producto(self, nombre: str, cantidad: int, precio: float) -> int:
         id_nuevo = self._siguiente_id()
-        self.productos[id_nuevo] = {
+        self._anotar_deshacer(id_nuevo)
+        producto = {
             "id": id_nuevo,
             "nombre": nombre,
             "cantidad": cantidad,
             "precio": precio,
         }
-        self._guardar_en_archivo()
+        self.productos[id_nuevo] = producto
+        self._actualizar_indices(None, producto)
+        self._persistir(OP_ALTA, id_nuevo)
+        return id_nuevo
 
+    @_con_cerrojo()
     def actualizar_producto(self, id_: int, nombre: Optional[str] = None,
                             cantidad: Optional[int] = None, precio: Optional[float] = None) -> None:
         if id_ not in self.productos:
             print("[INFO] Producto no encontrado.")
             return
+        self._anotar_deshacer(id_)
+        # Se reasigna una copia: el almacén columnar no admite mutar en sitio.
+        anterior = self.productos[id_]
+        producto = dict(anterior)
         if nombre:
-            self.productos[id_]["nombre"] = nombre
+            producto["nombre"] = nombre
         if cantidad is not None:
-            self.productos[id_]["cantidad"] = cantidad
+            producto["cantidad"] = cantidad
         if precio is not None:
-            self.productos[id_]["precio"] = precio
-        self._guardar_en_archivo()
+            producto["precio"] = precio
+        self.productos[id_] = producto
+        self._actualizar_indices(anterior, producto)
+        self._persistir(OP_ALTA, id_)
 
+    @_con_cerrojo()
     def eliminar_producto(self, id_: int) -> None:
         if id_ in self.productos:
-            self.productos.pop(id_)
-            self._guardar_en_archivo()
+            self._anotar_deshacer(id_)
+            self._actualizar_indices(self.productos.pop(id_), None)
+            self._persistir(OP_BAJA, id_)
             print(f"[OK] Producto {id_} eliminado.")
         else:
             print("[INFO] Producto no encontrado.")
 
+    @_con_cerrojo(exclusivo=False)
     def listar(self) -> List[Dict]:
         return list(self.productos.values())
 
+    @_con_cerrojo(exclusivo=False)
+    def consultar(self, cantidad_min: Optional[int] = None, cantidad_max: Optional[int] = None,
+                  precio_entre: Optional[Tuple[float, float]] = None,
+                  nombre_prefijo: Optional[str] = None) -> List[Dict]:
+        """
+        Productos que cumplen todos los criterios dados (límites inclusivos;
+        el prefijo no distingue mayúsculas). Se recorre solo el tramo del
+        índice más selectivo y el resto de criterios se comprueba por producto.
+        """
+        if self._indices is None:
+            self._indices = IndicesSecundarios(self.productos.values())
+        tramos = []
+        if cantidad_min is not None or cantidad_max is not None:
+            tramos.append(("cantidad", self._indices.rango("cantidad", cantidad_min, cantidad_max)))
+        if precio_entre is not None:
+            tramos.append(("precio", self._indices.rango("precio", *precio_entre)))
+        if nombre_prefijo is not None:
+            tramos.append(("nombre", self._indices.prefijo(nombre_prefijo)))
+        if not tramos:
+            return self.listar()
+        campo, (inicio, fin) = min(tramos, key=lambda t: t[1][1] - t[1][0])
+        prefijo = nombre_prefijo.lower() if nombre_prefijo is not None else None
+        resultados = []
+        for _, id_ in self._indices.listas[campo][inicio:fin]:
+            p = self.productos[id_]
+            if cantidad_min is not None and p["cantidad"] < cantidad_min:
+                continue
+            if cantidad_max is not None and p["cantidad"] > cantidad_max:
+                continue
+            if precio_entre is not None and not precio_entre[0] <= p["precio"] <= precio_entre[1]:
+                continue
+            if prefijo is not None and not p["nombre"].lower().startswith(prefijo):
+                continue
+            resultados.append(p)
+        return resultados
+
 
 # =============================== Interfaz CLI =============================== #
 
@@ -156,5 +960,76 @@ def menu() -> None:
             print("[INFO] Opción no válida.")
 
 
+# ================================ Benchmarks ================================ #
+
+def _generar_csv(ruta: str, filas: int) -> None:
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CAMPOS)
+        writer.writerows((i, f"Producto {i}", i % 500, round(i * 0.37 % 1000, 2))
+                         for i in range(1, filas + 1))
+
+
+def benchmark_carga(tamanos: Tuple[int, ...] = (1_000_000, 5_000_000, 10_000_000)) -> None:
+    """Compara la carga secuencial con la paralela a distintos números de procesos."""
+    nucleos = os.cpu_count() or 1
+    procesos = sorted({n for n in (2, 4, 8, 16, nucleos) if 2 <= n <= nucleos})
+    with tempfile.TemporaryDirectory() as tmp:
+        for filas in tamanos:
+            ruta = os.path.join(tmp, f"inventario_{filas}.txt")
+            _generar_csv(ruta, filas)
+            inv = Inventario(ruta)  # la primera carga calienta la caché de disco
+            inicio = time.perf_counter()
+            inv.cargar_desde_archivo()
+            base = time.perf_counter() - inicio
+            print(f"[BENCH] {filas:>10} filas | secuencial: {base:7.2f} s")
+            for n in procesos:
+                inv.paralelo, inv.procesos = True, n
+                inicio = time.perf_counter()
+                inv.cargar_desde_archivo()
+                t = time.perf_counter() - inicio
+                print(f"[BENCH] {filas:>10} filas | {n:>2} procesos: {t:7.2f} s (x{base / t:.2f})")
+            del inv
+
+
+def benchmark_memoria(filas: int = 1_000_000) -> None:
+    """Memoria retenida por producto: dict de dicts frente a AlmacenColumnar."""
+    for nombre, fabrica in (("dict de dicts", dict), ("columnar", AlmacenColumnar)):
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        almacen = fabrica()
+        for i in range(1, filas + 1):
+            # Nombres repetidos (catálogo con variantes) creados como cadenas nuevas,
+            # igual que al leerlos del CSV.
+            almacen[i] = {"id": i, "nombre": f"Producto {i % 10_000}",
+                          "cantidad": i % 500, "precio": i * 0.37 % 1000}
+        t = time.perf_counter() - inicio
+        actual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"[BENCH] {nombre:>14}: {actual / filas:7.1f} bytes/producto, "
+              f"{actual / 2**20:8.1f} MiB, construcción {t:.2f} s")
+        del almacen
+
+
+def benchmark_arranque(filas: int = 1_000_000) -> None:
+    """Tiempo de arranque leyendo el CSV frente a la instantánea binaria."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "inventario.txt")
+        _generar_csv(ruta, filas)
+        csv_a_binario(ruta)
+        for nombre, opciones in (("CSV", {}), ("binario", {"binario": True})):
+            Inventario(ruta, **opciones)  # calienta la caché de disco
+            inicio = time.perf_counter()
+            Inventario(ruta, **opciones)
+            t = time.perf_counter() - inicio
+            print(f"[BENCH] arranque {nombre:>8}: {t:6.2f} s ({filas / t:,.0f} productos/s)")
+
+
+BENCHMARKS = {"carga": benchmark_carga, "memoria": benchmark_memoria, "arranque": benchmark_arranque}
+
+
 if __name__ == "__main__":
-    menu()
+    if len(sys.argv) > 2 and sys.argv[1] == "--benchmark":
+        BENCHMARKS[sys.argv[2]]()
+    else:
+        menu()
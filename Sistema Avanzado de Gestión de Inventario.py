@@ -1,15 +1,63 @@
+import asyncio
+import functools
+import heapq
 import json
+import math
+import mmap
+import multiprocessing
+import itertools
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:  # el reporte vectorizado recurre a Python puro
+    np = None
+
+# Instantánea binaria (little-endian, versión 1):
+#   cabecera: magia "INVJ", versión, número de registros
+#   registros de 36 bytes: desplazamiento y longitud (en caracteres) del ID y
+#   del nombre dentro del montón, cantidad, precio y tipo de ID (1 = int, 0 = str)
+#   montón: IDs y nombres concatenados, en UTF-8
+MAGIA_BINARIA = b"INVJ"
+VERSION_BINARIA = 1
+CABECERA_BINARIA = struct.Struct("<4sH2xq")
+REGISTRO_BINARIO = struct.Struct("<IIIIqdB3x")
+
+# Número de cerrojos por franja de IDs para actualizar_producto
+NUM_FRANJAS = 64
+
+# Longitud máxima de una línea de petición de ServidorInventario
+LIMITE_LINEA = 64 * 1024
 
 class Producto:
     """
     Clase que representa un producto con atributos:
     ID (unico), nombre, cantidad y precio.
+    Usa __slots__ para no reservar un __dict__ por instancia.
     """
+    __slots__ = ('_id', '_nombre', '_cantidad', '_precio', '_inventario')
+
     def __init__(self, id, nombre, cantidad, precio):
         self._id = id
         self._nombre = nombre
         self._cantidad = cantidad
         self._precio = precio
+        # Inventario al que pertenece; se le avisa de cada cambio
+        self._inventario = None
+
+    def _notificar(self, campo, anterior):
+        if self._inventario is not None:
+            self._inventario._producto_modificado(self, campo, anterior)
 
     # Metodos para obtener y establecer atributos
     def get_id(self):
@@ -19,68 +67,487 @@ class Producto:
         return self._nombre
 
     def set_nombre(self, nuevo_nombre):
-        self._nombre = nuevo_nombre
+        # El nombre está en el índice de trigramas: lo cambia el inventario
+        # con su cerrojo de escritura para no cruzarse con las búsquedas.
+        if self._inventario is not None:
+            self._inventario._renombrar(self, nuevo_nombre)
+        else:
+            self._nombre = nuevo_nombre
 
     def get_cantidad(self):
         return self._cantidad
 
     def set_cantidad(self, nueva_cantidad):
+        anterior = self._cantidad
         self._cantidad = nueva_cantidad
+        self._notificar('cantidad', anterior)
 
     def get_precio(self):
         return self._precio
 
     def set_precio(self, nuevo_precio):
+        anterior = self._precio
         self._precio = nuevo_precio
+        self._notificar('precio', anterior)
 
     def __str__(self):
         return f"ID: {self._id}, Nombre: {self._nombre}, Cantidad: {self._cantidad}, Precio: {self._precio}"
 
+    @classmethod
+    def desde_registros(cls, registros):
+        """
+        Construye productos en bloque a partir de tuplas (id, nombre, cantidad, precio)
+        con itertools.starmap, sin un bucle explícito ni desempaquetar cada tupla.
+        """
+        return list(itertools.starmap(cls, registros))
+
+class ProductoCongelado(Producto):
+    """
+    Producto de solo lectura: sus setters lanzan AttributeError. Es lo que
+    crean cargar_desde_archivo y cargar_binario con congelado=True.
+    """
+    __slots__ = ()
+
+    def _rechazar(self, *args):
+        raise AttributeError(f"El producto {self._id} está congelado y no admite cambios.")
+
+    set_nombre = set_cantidad = set_precio = _rechazar
+
+def trigramas(texto):
+    """Conjunto de subcadenas de 3 caracteres de un texto."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas sobre los nombres en minúsculas.
+    Cada trigrama apunta a los IDs cuyo nombre lo contiene; las listas son
+    diccionarios (conjuntos ordenados) para conservar el orden de alta.
+    Una subcadena de 3 o más caracteres solo puede aparecer en nombres que
+    contengan todos sus trigramas; los candidatos se verifican después.
+    """
+    def __init__(self):
+        self.nombres = {}  # ID -> nombre en minúsculas
+        self.listas = {}   # trigrama -> {ID: None}
+        self.tamanos = {}  # ID -> número de trigramas del nombre
+        # Posición de alta de cada ID; solo hace falta para ordenar resultados
+        # cuando un renombrado dejó listas fuera de orden.
+        self.orden = {}
+        self._altas = 0
+        self._desordenado = False
+
+    def agregar(self, id_producto, nombre):
+        nombre = nombre.lower()
+        self.nombres[id_producto] = nombre
+        self.orden[id_producto] = self._altas
+        self._altas += 1
+        trigramas_nombre = trigramas(nombre)
+        self.tamanos[id_producto] = len(trigramas_nombre)
+        for t in trigramas_nombre:
+            self.listas.setdefault(t, {})[id_producto] = None
+
+    def _quitar_de_listas(self, id_producto, trigramas_nombre):
+        for t in trigramas_nombre:
+            lista = self.listas[t]
+            del lista[id_producto]
+            if not lista:
+                del self.listas[t]
+
+    def quitar(self, id_producto):
+        nombre = self.nombres.pop(id_producto, None)
+        if nombre is None:
+            return
+        del self.orden[id_producto]
+        del self.tamanos[id_producto]
+        self._quitar_de_listas(id_producto, trigramas(nombre))
+
+    def renombrar(self, id_producto, nombre):
+        """Cambia el nombre indexado de un ID conservando su posición de alta."""
+        anterior = self.nombres[id_producto]
+        nombre = nombre.lower()
+        viejos, nuevos = trigramas(anterior), trigramas(nombre)
+        self._quitar_de_listas(id_producto, viejos - nuevos)
+        for t in nuevos - viejos:
+            self.listas.setdefault(t, {})[id_producto] = None
+        self.nombres[id_producto] = nombre
+        self.tamanos[id_producto] = len(nuevos)
+        self._desordenado = True
+
+    def buscar(self, texto):
+        """IDs cuyo nombre contiene `texto` (sin distinguir mayúsculas), en orden de alta."""
+        texto = texto.lower()
+        if len(texto) < 3:
+            return [id_ for id_, nombre in self.nombres.items() if texto in nombre]
+        listas = [self.listas.get(t) for t in trigramas(texto)]
+        if not all(listas):
+            return []
+        listas.sort(key=len)
+        menor, resto = listas[0], listas[1:]
+        encontrados = [id_ for id_ in menor
+                       if all(id_ in lista for lista in resto) and texto in self.nombres[id_]]
+        if self._desordenado:
+            encontrados.sort(key=self.orden.__getitem__)
+        return encontrados
+
+    def similares(self, texto, k):
+        """
+        Los k IDs más parecidos a `texto` como [(similitud, ID)], de mayor a
+        menor similitud de Jaccard entre trigramas. Solo se puntúan los
+        nombres que comparten algún trigrama con la consulta. Las consultas
+        de menos de 3 caracteres puntúan len(texto) / len(nombre) entre los
+        nombres que la contienen. Una consulta vacía no encuentra nada.
+        """
+        if not texto.strip():
+            return []
+        texto = texto.lower()
+        trigramas_texto = trigramas(texto)
+        if not trigramas_texto:
+            return heapq.nlargest(k, ((len(texto) / len(self.nombres[id_]), id_)
+                                      for id_ in self.buscar(texto) if self.nombres[id_]),
+                                  key=itemgetter(0))
+        comunes = Counter()
+        for t in trigramas_texto:
+            comunes.update(self.listas.get(t, {}).keys())
+        n = len(trigramas_texto)
+        return heapq.nlargest(k, ((c / (n + self.tamanos[id_] - c), id_)
+                                  for id_, c in comunes.items()),
+                              key=itemgetter(0))
+
+class CacheBusquedas:
+    """
+    Caché LRU acotada de resultados de buscar_similares, por (consulta, k).
+    Cada consulta queda registrada bajo sus trigramas, así que un alta, baja
+    o renombrado solo invalida las consultas que comparten algún trigrama con
+    el nombre afectado; las consultas cortas (sin trigramas) se guardan
+    aparte y se invalidan si el nombre las contiene.
+    """
+    def __init__(self, capacidad=256):
+        self.capacidad = capacidad
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()  # (consulta, k) -> [(similitud, ID)]
+        self._por_trigrama = {}         # trigrama -> {(consulta, k)}
+        self._cortas = set()
+        self._cerrojo = threading.Lock()
+
+    def obtener(self, clave):
+        with self._cerrojo:
+            resultado = self._entradas.get(clave)
+            if resultado is None:
+                self.fallos += 1
+            else:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+            return resultado
+
+    def guardar(self, clave, resultado):
+        with self._cerrojo:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self._entradas[clave] = resultado
+                return
+            self._entradas[clave] = resultado
+            trigramas_consulta = trigramas(clave[0])
+            for t in trigramas_consulta:
+                self._por_trigrama.setdefault(t, set()).add(clave)
+            if not trigramas_consulta:
+                self._cortas.add(clave)
+            if len(self._entradas) > self.capacidad:
+                self._descartar(next(iter(self._entradas)))
+
+    def _descartar(self, clave):
+        del self._entradas[clave]
+        for t in trigramas(clave[0]):
+            claves = self._por_trigrama[t]
+            claves.discard(clave)
+            if not claves:
+                del self._por_trigrama[t]
+        self._cortas.discard(clave)
+
+    def invalidar(self, nombre):
+        """Descarta las consultas cuyo resultado puede cambiar si `nombre` aparece o desaparece."""
+        nombre = nombre.lower()
+        with self._cerrojo:
+            if not self._entradas:
+                return
+            afectadas = {clave for clave in self._cortas if clave[0] in nombre}
+            for t in trigramas(nombre):
+                afectadas.update(self._por_trigrama.get(t, ()))
+            for clave in afectadas:
+                self._descartar(clave)
+
+    def vaciar(self):
+        with self._cerrojo:
+            self._entradas.clear()
+            self._por_trigrama.clear()
+            self._cortas.clear()
+
+class AnaliticaInventario:
+    """
+    Agregados del inventario mantenidos en O(1) con cada alta, baja o cambio:
+    valor total del stock, unidades totales e IDs con stock bajo
+    (cantidad <= umbral_bajo_stock). recalcular() los rehace desde cero y
+    corrige el error de redondeo acumulado en el valor total.
+    """
+    def __init__(self, umbral_bajo_stock=5):
+        self.umbral_bajo_stock = umbral_bajo_stock
+        self.valor_total = 0.0
+        self.unidades_totales = 0
+        self.bajo_stock = set()
+
+    def agregar(self, producto):
+        cantidad = producto.get_cantidad()
+        self.valor_total += cantidad * producto.get_precio()
+        self.unidades_totales += cantidad
+        if cantidad <= self.umbral_bajo_stock:
+            self.bajo_stock.add(producto.get_id())
+
+    def quitar(self, producto):
+        cantidad = producto.get_cantidad()
+        self.valor_total -= cantidad * producto.get_precio()
+        self.unidades_totales -= cantidad
+        self.bajo_stock.discard(producto.get_id())
+
+    def modificar(self, producto, campo, anterior):
+        """Ajusta los agregados tras cambiar `campo` (su valor previo era `anterior`)."""
+        cantidad, precio = producto.get_cantidad(), producto.get_precio()
+        if campo == 'cantidad':
+            self.valor_total += (cantidad - anterior) * precio
+            self.unidades_totales += cantidad - anterior
+            if cantidad <= self.umbral_bajo_stock:
+                self.bajo_stock.add(producto.get_id())
+            else:
+                self.bajo_stock.discard(producto.get_id())
+        elif campo == 'precio':
+            self.valor_total += cantidad * (precio - anterior)
+
+    def recalcular(self, productos):
+        self.valor_total = math.fsum(p.get_cantidad() * p.get_precio() for p in productos.values())
+        self.unidades_totales = sum(p.get_cantidad() for p in productos.values())
+        self.bajo_stock = {id_ for id_, p in productos.items()
+                           if p.get_cantidad() <= self.umbral_bajo_stock}
+
+class CerrojoLectoresEscritor:
+    """
+    Cerrojo con preferencia de escritura: varios lectores a la vez o un único
+    escritor. No es reentrante.
+    """
+    def __init__(self):
+        self._condicion = threading.Condition(threading.Lock())
+        self._lectores = 0
+        self._escribiendo = False
+        self._escritores_esperando = 0
+
+    @contextmanager
+    def lectura(self):
+        with self._condicion:
+            while self._escribiendo or self._escritores_esperando:
+                self._condicion.wait()
+            self._lectores += 1
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._lectores -= 1
+                if not self._lectores:
+                    self._condicion.notify_all()
+
+    @contextmanager
+    def escritura(self):
+        with self._condicion:
+            self._escritores_esperando += 1
+            while self._escribiendo or self._lectores:
+                self._condicion.wait()
+            self._escritores_esperando -= 1
+            self._escribiendo = True
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._escribiendo = False
+                self._condicion.notify_all()
+
+def _compartido(metodo):
+    """Ejecuta el método con el cerrojo de lectura del inventario."""
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._cerrojo.lectura():
+            return metodo(self, *args, **kwargs)
+    return envoltura
+
+def _exclusivo(metodo):
+    """Ejecuta el método con el cerrojo de escritura del inventario."""
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._cerrojo.escritura():
+            return metodo(self, *args, **kwargs)
+    return envoltura
+
 class Inventario:
     """
     Clase que gestiona un inventario de productos.
     Utiliza un diccionario para almacenar productos con ID como clave.
+
+    Es seguro entre hilos: altas, bajas, cargas y guardados toman el cerrojo
+    de escritura; búsquedas, listados y actualizaciones, el de lectura. Las
+    actualizaciones de un mismo ID se serializan con un cerrojo por franja y
+    los agregados compartidos (índice, analítica, cambios pendientes) con
+    _cerrojo_agregados. Renombrar un producto (Producto.set_nombre) toma el
+    de escritura, y estadisticas/hay_cambios el de lectura para no ver una
+    alta o baja a medias. Con verboso=False no se muestran mensajes de estado.
     """
-    def __init__(self):
+    def __init__(self, umbral_bajo_stock=5, verboso=True, capacidad_cache=256):
         # Diccionario: clave = ID del producto, valor = objeto Producto
         self.productos = {}
+        self.verboso = verboso
+        self._cerrojo = CerrojoLectoresEscritor()
+        self._franjas = [threading.Lock() for _ in range(NUM_FRANJAS)]
+        self._cerrojo_agregados = threading.Lock()
+        # Totales y stock bajo actualizados con cada cambio
+        self.analitica = AnaliticaInventario(umbral_bajo_stock)
+        # Índice de trigramas de los nombres para buscar_por_nombre
+        self.indice_nombres = IndiceTrigramas()
+        # Resultados recientes de buscar_similares
+        self.cache_busquedas = CacheBusquedas(capacidad_cache)
+        # Seguimiento de cambios para guardar solo lo modificado: IDs altas o
+        # modificados e IDs eliminados desde el último guardado en _archivo_base.
+        self._sucios = set()
+        self._eliminados = set()
+        self._archivo_base = None
+        self._entradas_delta = 0
+
+    def _avisar(self, mensaje):
+        if self.verboso:
+            print(mensaje)
 
+    def _reconstruir_indice(self):
+        """
+        Reindexa todos los nombres y vincula los productos a este inventario
+        (tras cargar productos en bloque).
+        """
+        self.indice_nombres = IndiceTrigramas()
+        for id_producto, producto in self.productos.items():
+            producto._inventario = self
+            self.indice_nombres.agregar(id_producto, producto.get_nombre())
+        self.analitica.recalcular(self.productos)
+        self.cache_busquedas.vaciar()
+
+    def _incorporar(self, registros, clase=Producto):
+        """Construye en bloque los productos de tuplas (id, nombre, cantidad, precio) y los añade."""
+        nuevos = clase.desde_registros(registros)
+        self.productos.update(zip(map(Producto.get_id, nuevos), nuevos))
+
+    def _producto_modificado(self, producto, campo, anterior):
+        """Aviso de Producto: marca el ID como sucio y actualiza la analítica."""
+        id_producto = producto.get_id()
+        if self.productos.get(id_producto) is not producto:
+            return
+        with self._cerrojo_agregados:
+            self._sucios.add(id_producto)
+            self.analitica.modificar(producto, campo, anterior)
+
+    @_exclusivo
+    def _renombrar(self, producto, nuevo_nombre):
+        """Cambia el nombre de un producto y lo reindexa (desde Producto.set_nombre)."""
+        anterior = producto._nombre
+        producto._nombre = nuevo_nombre
+        id_producto = producto.get_id()
+        if self.productos.get(id_producto) is not producto:
+            return
+        self._sucios.add(id_producto)
+        self.indice_nombres.renombrar(id_producto, nuevo_nombre)
+        self.cache_busquedas.invalidar(anterior)
+        self.cache_busquedas.invalidar(nuevo_nombre)
+
+    @_exclusivo
     def agregar_producto(self, producto):
-        """Agrega un producto al inventario si el ID no existe."""
+        """Agrega un producto al inventario si el ID no existe. Devuelve si se agregó."""
         if producto.get_id() in self.productos:
-            print("Ya existe un producto con ese ID.")
+            self._avisar("Ya existe un producto con ese ID.")
+            return False
         else:
             self.productos[producto.get_id()] = producto
-            print("Producto agregado exitosamente.")
+            producto._inventario = self
+            self.indice_nombres.agregar(producto.get_id(), producto.get_nombre())
+            self.analitica.agregar(producto)
+            self.cache_busquedas.invalidar(producto.get_nombre())
+            self._sucios.add(producto.get_id())
+            self._eliminados.discard(producto.get_id())
+            self._avisar("Producto agregado exitosamente.")
+            return True
 
+    @_exclusivo
     def eliminar_producto(self, id_producto):
-        """Elimina un producto del inventario por su ID."""
+        """Elimina un producto del inventario por su ID. Devuelve si existía."""
         if id_producto in self.productos:
-            del self.productos[id_producto]
-            print("Producto eliminado.")
+            producto = self.productos.pop(id_producto)
+            producto._inventario = None
+            self.indice_nombres.quitar(id_producto)
+            self.analitica.quitar(producto)
+            self.cache_busquedas.invalidar(producto.get_nombre())
+            self._sucios.discard(id_producto)
+            self._eliminados.add(id_producto)
+            self._avisar("Producto eliminado.")
+            return True
         else:
-            print("Producto no encontrado.")
+            self._avisar("Producto no encontrado.")
+            return False
 
+    @_compartido
     def actualizar_producto(self, id_producto, nueva_cantidad=None, nuevo_precio=None):
         """
         Actualiza la cantidad y/o precio de un producto dado su ID.
         Se pueden pasar valores None para no modificar ese campo.
+        Devuelve si el producto existía.
         """
-        if id_producto in self.productos:
-            if nueva_cantidad is not None:
-                self.productos[id_producto].set_cantidad(nueva_cantidad)
-            if nuevo_precio is not None:
-                self.productos[id_producto].set_precio(nuevo_precio)
-            print("Producto actualizado.")
+        producto = self.productos.get(id_producto)
+        if producto is not None:
+            with self._franjas[hash(id_producto) % NUM_FRANJAS]:
+                if nueva_cantidad is not None:
+                    producto.set_cantidad(nueva_cantidad)
+                if nuevo_precio is not None:
+                    producto.set_precio(nuevo_precio)
+            self._avisar("Producto actualizado.")
+            return True
         else:
-            print("Producto no encontrado.")
+            self._avisar("Producto no encontrado.")
+            return False
+
+    @_compartido
+    def obtener_producto(self, id_producto):
+        """Devuelve el registro (dict) del producto o None si no existe."""
+        producto = self.productos.get(id_producto)
+        if producto is None:
+            return None
+        with self._franjas[hash(id_producto) % NUM_FRANJAS]:
+            return self._registro(producto)
+
+    @_compartido
+    def buscar(self, nombre, limite=None):
+        """Registros (hasta `limite`) de los productos cuyo nombre contiene `nombre`, sin mostrarlos."""
+        ids = itertools.islice(self.indice_nombres.buscar(nombre), limite)
+        return [self._registro(self.productos[id_]) for id_ in ids]
 
+    @_compartido
+    def buscar_similares(self, consulta, k=10):
+        """
+        Hasta k productos ordenados por parecido del nombre con `consulta`
+        (tolera errores de escritura), como [(producto, similitud)].
+        Los resultados recientes se sirven desde cache_busquedas.
+        """
+        clave = (consulta.lower(), k)
+        resultado = self.cache_busquedas.obtener(clave)
+        if resultado is None:
+            resultado = self.indice_nombres.similares(consulta, k)
+            self.cache_busquedas.guardar(clave, resultado)
+        return [(self.productos[id_], similitud) for similitud, id_ in resultado]
+
+    @_compartido
     def buscar_por_nombre(self, nombre):
         """
         Busca productos cuyo nombre contenga la cadena dada (case-insensitive).
         Muestra los resultados encontrados.
         """
-        encontrados = [p for p in self.productos.values() if nombre.lower() in p.get_nombre().lower()]
+        encontrados = [self.productos[id_] for id_ in self.indice_nombres.buscar(nombre)]
         if encontrados:
             print(f"Resultados de la búsqueda de '{nombre}':")
             for p in encontrados:
@@ -88,6 +555,7 @@ class Inventario:
         else:
             print("No se encontraron productos con ese nombre.")
 
+    @_compartido
     def mostrar_todos(self):
         """Muestra todos los productos en el inventario."""
         if self.productos:
@@ -97,43 +565,568 @@ class Inventario:
         else:
             print("El inventario está vacío.")
 
-    def guardar_en_archivo(self, nombre_archivo):
+    @staticmethod
+    def _registro(p):
+        return {
+            'id': p.get_id(),
+            'nombre': p.get_nombre(),
+            'cantidad': p.get_cantidad(),
+            'precio': p.get_precio()
+        }
+
+    def _registros(self):
+        """Genera un diccionario por producto, sin construir una lista completa."""
+        for p in self.productos.values():
+            yield self._registro(p)
+
+    @_compartido
+    def estadisticas(self):
+        """Totales del inventario sin recorrer los productos."""
+        with self._cerrojo_agregados:
+            return {
+                'productos': len(self.productos),
+                'unidades': self.analitica.unidades_totales,
+                'valor_total': self.analitica.valor_total,
+                'bajo_stock': len(self.analitica.bajo_stock)
+            }
+
+    @_compartido
+    def productos_bajo_stock(self):
+        """Productos con cantidad <= umbral, de menor a mayor cantidad."""
+        with self._cerrojo_agregados:
+            ids = list(self.analitica.bajo_stock)
+        return sorted((self.productos[id_] for id_ in ids), key=Producto.get_cantidad)
+
+    @_compartido
+    def hay_cambios(self):
+        """Indica si hay altas, bajas o modificaciones sin guardar."""
+        with self._cerrojo_agregados:
+            return bool(self._sucios or self._eliminados)
+
+    @_compartido
+    def reporte_vectorizado(self):
+        """
+        Reporte ad hoc sobre todo el catálogo: totales, precio medio y
+        mediana de cantidad. Usa NumPy si está instalado.
+        """
+        n = len(self.productos)
+        if n == 0:
+            return {'productos': 0, 'unidades': 0, 'valor_total': 0.0,
+                    'precio_medio': 0.0, 'mediana_cantidad': 0}
+        productos = self.productos.values()
+        if np is not None:
+            cantidades = np.fromiter(map(Producto.get_cantidad, productos), dtype=np.int64, count=n)
+            precios = np.fromiter(map(Producto.get_precio, productos), dtype=np.float64, count=n)
+            return {'productos': n, 'unidades': int(cantidades.sum()),
+                    'valor_total': float(np.dot(cantidades, precios)),
+                    'precio_medio': float(precios.mean()),
+                    'mediana_cantidad': float(np.median(cantidades))}
+        cantidades = sorted(map(Producto.get_cantidad, productos))
+        mitad = n // 2
+        mediana = cantidades[mitad] if n % 2 else (cantidades[mitad - 1] + cantidades[mitad]) / 2
+        return {'productos': n, 'unidades': sum(cantidades),
+                'valor_total': math.fsum(p.get_cantidad() * p.get_precio() for p in productos),
+                'precio_medio': math.fsum(map(Producto.get_precio, productos)) / n,
+                'mediana_cantidad': float(mediana)}
+
+    @_exclusivo
+    def guardar_en_archivo(self, nombre_archivo, formato='jsonl'):
         """
-        Guarda el inventario en un archivo JSON.
-        Serializa la colección (lista de diccionarios de productos).
+        Guarda el inventario en un archivo.
+        Por defecto usa JSON Lines (un producto por línea), escrito a medida que
+        se recorren los productos; formato='json' genera la lista indentada
+        original. Escribe en un temporal y lo reemplaza al terminar.
+        Si el archivo es el mismo del último guardado o carga, solo se añaden
+        los cambios a '<archivo>.delta' (o no se escribe nada si no los hay);
+        cuando el delta supera el tamaño del inventario se fusiona con la base.
         """
+        if (formato == 'jsonl' and nombre_archivo == self._archivo_base
+                and os.path.exists(nombre_archivo)):
+            cambios = len(self._sucios) + len(self._eliminados)
+            if not cambios:
+                self._avisar("Sin cambios desde el último guardado.")
+                return
+            if self._entradas_delta + cambios <= len(self.productos):
+                self._guardar_delta(nombre_archivo)
+                return
+        self._guardar_completo(nombre_archivo, formato)
+
+    @_exclusivo
+    def fusionar_delta(self, nombre_archivo):
+        """Reescribe la base completa y elimina su archivo delta."""
+        self._guardar_completo(nombre_archivo, 'jsonl')
+
+    def _guardar_completo(self, nombre_archivo, formato):
         try:
-            lista_productos = []
-            for p in self.productos.values():
-                # Convertir objeto Producto a diccionario
-                lista_productos.append({
-                    'id': p.get_id(),
-                    'nombre': p.get_nombre(),
-                    'cantidad': p.get_cantidad(),
-                    'precio': p.get_precio()
-                })
-            with open(nombre_archivo, 'w') as f:
-                json.dump(lista_productos, f, indent=4)
-            print("Inventario guardado en archivo.")
+            tmp = nombre_archivo + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                if formato == 'json':
+                    json.dump(list(self._registros()), f, indent=4)
+                else:
+                    f.writelines(json.dumps(registro) + '\n' for registro in self._registros())
+            os.replace(tmp, nombre_archivo)
+            try:
+                os.remove(nombre_archivo + '.delta')
+            except FileNotFoundError:
+                pass
+            self._archivo_base = nombre_archivo
+            self._entradas_delta = 0
+            self._sucios.clear()
+            self._eliminados.clear()
+            self._avisar("Inventario guardado en archivo.")
         except IOError:
-            print("Error al guardar el archivo.")
+            self._avisar("Error al guardar el archivo.")
+
+    def _guardar_delta(self, nombre_archivo):
+        try:
+            with open(nombre_archivo + '.delta', 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps({'id': id_, 'eliminado': True}) + '\n'
+                             for id_ in self._eliminados)
+                f.writelines(json.dumps(self._registro(self.productos[id_])) + '\n'
+                             for id_ in self._sucios)
+            cambios = len(self._sucios) + len(self._eliminados)
+            self._entradas_delta += cambios
+            self._sucios.clear()
+            self._eliminados.clear()
+            self._avisar(f"Cambios guardados en archivo ({cambios} registros).")
+        except IOError:
+            self._avisar("Error al guardar el archivo.")
+
+    @staticmethod
+    def _informar_corruptos(lineas_corruptas, nombre_archivo):
+        if lineas_corruptas:
+            muestra = ', '.join(map(str, lineas_corruptas[:10]))
+            extra = ', ...' if len(lineas_corruptas) > 10 else ''
+            print(f"Se omitieron {len(lineas_corruptas)} registros corruptos en "
+                  f"'{nombre_archivo}' (líneas {muestra}{extra}).")
 
-    def cargar_desde_archivo(self, nombre_archivo):
+    @staticmethod
+    def _leer_jsonl(f, lineas_corruptas):
+        """Genera (id, nombre, cantidad, precio) por línea válida; anota las corruptas."""
+        for numero, linea in enumerate(f, 1):
+            if not linea.strip():
+                continue
+            try:
+                item = json.loads(linea)
+                yield item['id'], item['nombre'], item['cantidad'], item['precio']
+            except (json.JSONDecodeError, KeyError, TypeError):
+                lineas_corruptas.append(numero)
+
+    def _aplicar_delta(self, nombre_archivo, clase=Producto):
+        """Aplica sobre los productos cargados los cambios de '<archivo>.delta'."""
+        ruta = nombre_archivo + '.delta'
+        self._entradas_delta = 0
+        lineas_corruptas = []
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                for numero, linea in enumerate(f, 1):
+                    if not linea.strip():
+                        continue
+                    try:
+                        item = json.loads(linea)
+                        if item.get('eliminado'):
+                            self.productos.pop(item['id'], None)
+                        else:
+                            producto = clase(item['id'], item['nombre'], item['cantidad'], item['precio'])
+                            self.productos[producto.get_id()] = producto
+                    except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                        lineas_corruptas.append(numero)
+                        continue
+                    self._entradas_delta += 1
+        except FileNotFoundError:
+            pass
+        self._informar_corruptos(lineas_corruptas, ruta)
+
+    @_exclusivo
+    def cargar_desde_archivo(self, nombre_archivo, congelado=False):
         """
-        Carga el inventario desde un archivo JSON.
-        Deserializa la información y reconstruye los objetos Producto.
+        Carga el inventario desde un archivo JSON Lines o JSON (lista).
+        El formato se detecta por el primer carácter: '[' es el formato antiguo.
+        En JSON Lines los registros corruptos se omiten y se informa su línea.
+        Después se aplican los cambios pendientes de '<archivo>.delta'.
+        Con congelado=True los productos cargados son ProductoCongelado y no
+        admiten cambios (las altas y bajas siguen permitidas).
         """
+        clase = ProductoCongelado if congelado else Producto
+        habia_productos = bool(self.productos)
+        correcto = True
         try:
-            with open(nombre_archivo, 'r') as f:
-                lista_productos = json.load(f)
-                for item in lista_productos:
-                    producto = Producto(item['id'], item['nombre'], item['cantidad'], item['precio'])
-                    self.productos[producto.get_id()] = producto
-            print("Inventario cargado desde archivo.")
+            with open(nombre_archivo, 'r', encoding='utf-8') as f:
+                primero = ''
+                while True:
+                    c = f.read(1)
+                    if not c or not c.isspace():
+                        primero = c
+                        break
+                f.seek(0)
+                if primero == '[':
+                    lista_productos = json.load(f)
+                    self._incorporar(map(itemgetter('id', 'nombre', 'cantidad', 'precio'), lista_productos),
+                                     clase)
+                else:
+                    lineas_corruptas = []
+                    self._incorporar(self._leer_jsonl(f, lineas_corruptas), clase)
+                    self._informar_corruptos(lineas_corruptas, nombre_archivo)
+            self._aplicar_delta(nombre_archivo, clase)
+            self._avisar("Inventario cargado desde archivo.")
         except FileNotFoundError:
-            print("No se encontró el archivo de inventario. Se creará uno nuevo al guardar.")
+            self._avisar("No se encontró el archivo de inventario. Se creará uno nuevo al guardar.")
         except json.JSONDecodeError:
-            print("Error al leer el archivo. El formato es incorrecto.")
+            self._avisar("Error al leer el archivo. El formato es incorrecto.")
+            correcto = False
+        self._reconstruir_indice()
+        # Solo se puede guardar por deltas si la memoria refleja exactamente el archivo.
+        self._archivo_base = nombre_archivo if correcto and not habia_productos else None
+        self._sucios.clear()
+        self._eliminados.clear()
+
+    @_exclusivo
+    def guardar_binario(self, nombre_archivo):
+        """
+        Guarda el inventario como instantánea binaria (registros de ancho fijo
+        más un montón de cadenas). Escribe en un temporal y lo reemplaza.
+        """
+        try:
+            registros = bytearray()
+            textos = []
+            desplazamiento = 0
+            for p in self.productos.values():
+                id_ = str(p.get_id())
+                nombre = p.get_nombre()
+                registros += REGISTRO_BINARIO.pack(
+                    desplazamiento, len(id_), desplazamiento + len(id_), len(nombre),
+                    p.get_cantidad(), p.get_precio(), isinstance(p.get_id(), int))
+                textos.append(id_)
+                textos.append(nombre)
+                desplazamiento += len(id_) + len(nombre)
+            tmp = nombre_archivo + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(CABECERA_BINARIA.pack(MAGIA_BINARIA, VERSION_BINARIA, len(self.productos)))
+                f.write(registros)
+                f.write(''.join(textos).encode('utf-8'))
+            os.replace(tmp, nombre_archivo)
+            self._avisar("Inventario guardado en archivo binario.")
+        except IOError:
+            self._avisar("Error al guardar el archivo binario.")
+
+    @_exclusivo
+    def cargar_binario(self, nombre_archivo, congelado=False):
+        """
+        Carga una instantánea binaria mapeándola en memoria: los números se
+        leen tal cual y el montón de textos se decodifica de una sola vez.
+        congelado=True carga ProductoCongelado, como en cargar_desde_archivo.
+        """
+        try:
+            with open(nombre_archivo, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                magia, version, n = CABECERA_BINARIA.unpack_from(mapa)
+                if magia != MAGIA_BINARIA or version != VERSION_BINARIA:
+                    self._avisar("Error al leer el archivo. El formato es incorrecto.")
+                    return
+                inicio = CABECERA_BINARIA.size
+                base = inicio + n * REGISTRO_BINARIO.size
+                monton = mapa[base:].decode('utf-8')
+
+                def registros():
+                    for id_desp, id_largo, nom_desp, nom_largo, cantidad, precio, id_entero in \
+                            REGISTRO_BINARIO.iter_unpack(mapa[inicio:base]):
+                        id_ = monton[id_desp:id_desp + id_largo]
+                        yield (int(id_) if id_entero else id_,
+                               monton[nom_desp:nom_desp + nom_largo], cantidad, precio)
+
+                self._incorporar(registros(), ProductoCongelado if congelado else Producto)
+            self._avisar("Inventario cargado desde archivo binario.")
+        except FileNotFoundError:
+            self._avisar("No se encontró el archivo binario de inventario.")
+        except (ValueError, struct.error):
+            self._avisar("Error al leer el archivo. El formato es incorrecto.")
+        self._reconstruir_indice()
+        # como en cargar_desde_archivo: lo pendiente era del contenido anterior
+        self._archivo_base = None
+        self._sucios.clear()
+        self._eliminados.clear()
+
+def json_a_binario(ruta_json, ruta_binaria):
+    """Convierte un inventario JSON en instantánea binaria."""
+    inventario = Inventario()
+    inventario.cargar_desde_archivo(ruta_json)
+    inventario.guardar_binario(ruta_binaria)
+
+def binario_a_json(ruta_binaria, ruta_json):
+    """Convierte una instantánea binaria en inventario JSON."""
+    inventario = Inventario()
+    inventario.cargar_binario(ruta_binaria)
+    inventario.guardar_en_archivo(ruta_json)
+
+class ServidorInventario:
+    """
+    Servidor asyncio de líneas en localhost. Cada línea es una petición JSON
+    ({"op": ..., ...}) y recibe una línea JSON de respuesta, en el mismo
+    orden, así que los clientes pueden encadenar peticiones sin esperar.
+    Operaciones: agregar, eliminar, actualizar, obtener, buscar (como mucho
+    `limite_busqueda` resultados si no se pide otro límite), similares y
+    estadisticas.
+    Los cambios se guardan por lotes cada `intervalo_guardado` segundos (como
+    delta, en un hilo aparte) y al detener el servidor. Las peticiones toman
+    los cerrojos del inventario, así que también se atienden en hilos: un
+    guardado completo no detiene el bucle de eventos.
+    """
+    def __init__(self, inventario, archivo='inventario.json', intervalo_guardado=1.0,
+                 limite_busqueda=100):
+        self.inventario = inventario
+        self.archivo = archivo
+        self.intervalo_guardado = intervalo_guardado
+        self.limite_busqueda = limite_busqueda
+        self.puerto = None
+        self._operaciones = {
+            'agregar': self._op_agregar,
+            'eliminar': self._op_eliminar,
+            'actualizar': self._op_actualizar,
+            'obtener': self._op_obtener,
+            'buscar': self._op_buscar,
+            'similares': self._op_similares,
+            'estadisticas': self._op_estadisticas
+        }
+
+    def _op_agregar(self, peticion):
+        producto = Producto(peticion['id'], str(peticion['nombre']),
+                            int(peticion['cantidad']), float(peticion['precio']))
+        return {'ok': self.inventario.agregar_producto(producto)}
+
+    def _op_eliminar(self, peticion):
+        return {'ok': self.inventario.eliminar_producto(peticion['id'])}
+
+    def _op_actualizar(self, peticion):
+        cantidad = peticion.get('cantidad')
+        precio = peticion.get('precio')
+        return {'ok': self.inventario.actualizar_producto(
+            peticion['id'],
+            None if cantidad is None else int(cantidad),
+            None if precio is None else float(precio))}
+
+    def _op_obtener(self, peticion):
+        producto = self.inventario.obtener_producto(peticion['id'])
+        return {'ok': producto is not None, 'producto': producto}
+
+    def _op_buscar(self, peticion):
+        limite = int(peticion.get('limite', self.limite_busqueda))
+        return {'ok': True, 'productos': self.inventario.buscar(str(peticion['nombre']), limite)}
+
+    def _op_similares(self, peticion):
+        resultado = self.inventario.buscar_similares(str(peticion['consulta']),
+                                                     int(peticion.get('k', 10)))
+        return {'ok': True, 'productos': [dict(Inventario._registro(p), similitud=similitud)
+                                          for p, similitud in resultado]}
+
+    def _op_estadisticas(self, peticion):
+        return {'ok': True, 'estadisticas': self.inventario.estadisticas()}
+
+    def atender(self, peticion):
+        """Ejecuta una petición ya decodificada y devuelve la respuesta."""
+        if not isinstance(peticion, dict):
+            return {'ok': False, 'error': 'La petición debe ser un objeto JSON.'}
+        operacion = self._operaciones.get(peticion.get('op'))
+        if operacion is None:
+            return {'ok': False, 'error': f"Operación desconocida: {peticion.get('op')!r}."}
+        try:
+            return operacion(peticion)
+        except (KeyError, TypeError, ValueError) as e:
+            return {'ok': False, 'error': f"Petición inválida: {e}"}
+        except Exception as e:
+            # cualquier otro fallo se responde en vez de cortar la conexión del cliente
+            return {'ok': False, 'error': f"Error interno: {type(e).__name__}: {e}"}
+
+    def _atender_lineas(self, lineas):
+        """Respuestas (ya codificadas) a unas líneas de petición, en orden."""
+        respuestas = []
+        for linea in lineas:
+            try:
+                respuesta = self.atender(json.loads(linea.decode('utf-8')))
+            except UnicodeDecodeError:
+                respuesta = {'ok': False, 'error': 'La petición no es texto UTF-8.'}
+            except json.JSONDecodeError:
+                respuesta = {'ok': False, 'error': 'JSON inválido.'}
+            respuestas.append(json.dumps(respuesta).encode('utf-8') + b'\n')
+        return b''.join(respuestas)
+
+    async def _atender_cliente(self, reader, writer):
+        # Se atienden juntas, en un hilo, todas las líneas completas que han
+        # llegado: las peticiones encadenadas solo pagan un salto de hilo.
+        pendiente = b''
+        try:
+            while True:
+                bloque = await reader.read(LIMITE_LINEA)
+                if not bloque:
+                    break
+                *lineas, pendiente = (pendiente + bloque).split(b'\n')
+                if lineas:
+                    writer.write(await asyncio.to_thread(self._atender_lineas, lineas))
+                    await writer.drain()
+                if len(pendiente) > LIMITE_LINEA:
+                    writer.write(json.dumps({'ok': False, 'error': 'Línea demasiado larga.'}).encode('utf-8') + b'\n')
+                    await writer.drain()
+                    pendiente = b''
+                    break
+            if pendiente.strip():
+                writer.write(await asyncio.to_thread(self._atender_lineas, [pendiente]))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _guardar_periodicamente(self):
+        while True:
+            await asyncio.sleep(self.intervalo_guardado)
+            if await asyncio.to_thread(self.inventario.hay_cambios):
+                await asyncio.to_thread(self.inventario.guardar_en_archivo, self.archivo)
+
+    async def servir(self, host='127.0.0.1', puerto=8765, listo=None):
+        """
+        Atiende clientes hasta que se cancele. Con puerto=0 se elige uno libre;
+        `listo`, si se indica, recibe el puerto cuando el servidor escucha.
+        """
+        servidor = await asyncio.start_server(self._atender_cliente, host, puerto, backlog=1024)
+        self.puerto = servidor.sockets[0].getsockname()[1]
+        guardado = asyncio.create_task(self._guardar_periodicamente())
+        if listo is not None:
+            listo(self.puerto)
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            guardado.cancel()
+            if self.inventario.hay_cambios():
+                self.inventario.guardar_en_archivo(self.archivo)
+
+def servir(puerto=8765, archivo='inventario.json'):
+    """Carga el inventario y lo expone con ServidorInventario hasta Ctrl+C."""
+    inventario = Inventario(verboso=False)
+    inventario.cargar_desde_archivo(archivo)
+    print(f"Servidor de inventario en 127.0.0.1:{puerto} (Ctrl+C para salir).")
+    try:
+        asyncio.run(ServidorInventario(inventario, archivo).servir(puerto=puerto))
+    except KeyboardInterrupt:
+        pass
+    print("Servidor detenido.")
+
+async def _cliente_carga(puerto, peticiones, profundidad, latencias):
+    """Envía las peticiones en tandas de `profundidad` y anota la latencia de cada una."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', puerto, limit=2 ** 20)
+    for i in range(0, len(peticiones), profundidad):
+        tanda = peticiones[i:i + profundidad]
+        inicio = time.perf_counter()
+        writer.write(b''.join(tanda))
+        await writer.drain()
+        for _ in tanda:
+            await reader.readline()
+            latencias.append(time.perf_counter() - inicio)
+    writer.close()
+    await writer.wait_closed()
+
+async def generar_carga(puerto, clientes, peticiones=20_000, n_productos=10_000, profundidad=1):
+    """
+    Generador de carga: `clientes` conexiones concurrentes reparten
+    `peticiones` (70 % obtener, 20 % actualizar, 10 % buscar) sobre IDs
+    0..n_productos-1. Devuelve (peticiones por segundo, latencia p99 en s).
+    """
+    lotes = []
+    for c in range(clientes):
+        aleatorio = random.Random(c)
+        lote = []
+        for _ in range(peticiones // clientes):
+            id_ = str(aleatorio.randrange(n_productos))
+            tirada = aleatorio.random()
+            if tirada < 0.7:
+                peticion = {'op': 'obtener', 'id': id_}
+            elif tirada < 0.9:
+                peticion = {'op': 'actualizar', 'id': id_, 'cantidad': aleatorio.randrange(500)}
+            else:
+                peticion = {'op': 'buscar', 'nombre': f"ducto {id_}"}
+            lote.append(json.dumps(peticion).encode('utf-8') + b'\n')
+        lotes.append(lote)
+    latencias = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_cliente_carga(puerto, lote, profundidad, latencias) for lote in lotes))
+    t = time.perf_counter() - inicio
+    latencias.sort()
+    return len(latencias) / t, latencias[int(0.99 * (len(latencias) - 1))]
+
+def _proceso_servidor(archivo, conexion):
+    inventario = Inventario(verboso=False)
+    inventario.cargar_desde_archivo(archivo)
+    asyncio.run(ServidorInventario(inventario, archivo).servir(puerto=0, listo=conexion.send))
+
+def benchmark_servidor(n=10_000, peticiones=20_000):
+    """Peticiones por segundo y latencia p99 del servidor con 1, 16 y 256 clientes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        archivo = os.path.join(tmp, 'inventario.json')
+        inventario = Inventario(verboso=False)
+        inventario._incorporar((str(i), f"Producto {i}", i % 500, i * 0.37 % 1000) for i in range(n))
+        inventario.guardar_en_archivo(archivo)
+        receptor, emisor = multiprocessing.Pipe(duplex=False)
+        proceso = multiprocessing.Process(target=_proceso_servidor, args=(archivo, emisor), daemon=True)
+        proceso.start()
+        try:
+            puerto = receptor.recv()
+            for clientes, profundidad in ((1, 1), (16, 1), (256, 1), (1, 32)):
+                rps, p99 = asyncio.run(generar_carga(puerto, clientes, peticiones, n, profundidad))
+                print(f"[BENCH] servidor {clientes:>3} clientes, {profundidad:>2} en cadena: "
+                      f"{rps:10,.0f} peticiones/s, p99 {p99 * 1000:7.2f} ms")
+        finally:
+            proceso.terminate()
+            proceso.join()
+
+def benchmark_arranque(n=1_000_000):
+    """Compara el tiempo de arranque desde JSON y desde la instantánea binaria."""
+    inventario = Inventario()
+    for i in range(n):
+        inventario.productos[str(i)] = Producto(str(i), f"Producto {i}", i % 500, i * 0.37 % 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_json = os.path.join(tmp, 'inventario.json')
+        ruta_binaria = os.path.join(tmp, 'inventario.bin')
+        inventario.guardar_en_archivo(ruta_json)
+        inventario.guardar_binario(ruta_binaria)
+        del inventario
+        for nombre, ruta, metodo in (("JSON", ruta_json, Inventario.cargar_desde_archivo),
+                                     ("binario", ruta_binaria, Inventario.cargar_binario)):
+            cargado = Inventario()
+            inicio = time.perf_counter()
+            metodo(cargado, ruta)
+            t = time.perf_counter() - inicio
+            print(f"[BENCH] arranque {nombre:>8}: {t:6.2f} s ({n / t:,.0f} productos/s)")
+
+class _ProductoConDict:
+    """Disposición anterior de Producto (con __dict__), solo para comparar."""
+    def __init__(self, id, nombre, cantidad, precio):
+        self._id = id
+        self._nombre = nombre
+        self._cantidad = cantidad
+        self._precio = precio
+        self._inventario = None
+
+def benchmark_productos(n=1_000_000):
+    """
+    Bytes por producto y productos por segundo. Cada caso cambia una sola cosa
+    respecto al anterior: __dict__ frente a __slots__ con el mismo bucle, y
+    luego el bucle frente a desde_registros con la misma clase.
+    """
+    registros = [(str(i), f"Producto {i}", i % 500, i * 0.37 % 1000) for i in range(n)]
+    casos = (("con __dict__ (bucle)", lambda: [_ProductoConDict(*r) for r in registros]),
+             ("__slots__ (bucle)", lambda: [Producto(*r) for r in registros]),
+             ("__slots__ (desde_registros)", lambda: Producto.desde_registros(registros)))
+    for nombre, construir in casos:
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        productos = construir()
+        t = time.perf_counter() - inicio
+        memoria, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"[BENCH] {nombre:>27}: {memoria / n:6.1f} bytes/producto, {n / t:,.0f} productos/s")
+        del productos
+
+BENCHMARKS = {'arranque': benchmark_arranque, 'productos': benchmark_productos,
+              'servidor': benchmark_servidor}
 
 def main():
     inventario = Inventario()
@@ -205,4 +1198,9 @@ def main():
             print("Opc\u00edon no v\u00e1lida. Intenta de nuevo.")
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 2 and sys.argv[1] == '--benchmark':
+        BENCHMARKS[sys.argv[2]]()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--servir':
+        servir(int(sys.argv[2]) if len(sys.argv) > 2 else 8765)
+    else:
+        main()
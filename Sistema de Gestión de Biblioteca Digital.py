@@ -1,10 +1,61 @@
+import argparse
+import contextlib
+import cProfile
+import functools
+import glob
+import heapq
+import inspect
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from array import array
+from collections import deque
+from collections.abc import Mapping, MutableMapping
 from dataclasses import dataclass, field
-from typing import Tuple, List, Dict, Optional
+from operator import itemgetter
+from typing import Tuple, List, Dict, Iterable, Optional
+
+try:
+    import resource
+except ImportError:  # sin resource (Windows) no se informa del RSS máximo
+    resource = None
+
+# Códigos de estado de las operaciones internas y de procesar_eventos
+ESTADO_OK = 0
+ESTADO_LIBRO_NO_EXISTE = 1
+ESTADO_USUARIO_NO_REGISTRADO = 2
+ESTADO_YA_PRESTADO = 3
+ESTADO_NO_PRESTADO_A_USUARIO = 4
+ESTADO_EVENTO_INVALIDO = 5
+ESTADO_YA_EXISTE = 6
+ESTADO_USUARIO_CON_PRESTAMOS = 7
+
+# Persistencia: la instantánea '<ruta>' es un JSON compacto con la generación
+# a partir de la cual hay que reproducir el diario; cada generación del diario
+# es '<ruta>.wal.<g>', una línea JSON por operación confirmada:
+#   ["AL", autor, título, categoría, isbn]   añadir libro
+#   ["QL", isbn]                             quitar libro
+#   ["RU", nombre, user_id]                  registrar usuario
+#   ["BU", user_id]                          dar de baja usuario
+#   ["P", isbn, user_id, prestado, vence]    prestar (marcas de tiempo en segundos epoch)
+#   ["D", isbn, user_id]                     devolver
+#   ["R", isbn, user_id, vence]              renovar
+VERSION_INSTANTANEA = 2
 
 # --------------------------
 # Clase Libro
 # --------------------------
-@dataclass
+@dataclass(slots=True)
 class Libro:
     # meta guarda (autor, título) como tupla inmutable según requisito
     meta: Tuple[str, str]  # (autor, título)
@@ -12,6 +63,11 @@ class Libro:
     isbn: str
     is_borrowed: bool = field(default=False)  # indica si está prestado
 
+    def __post_init__(self):
+        # autor y categoría se repiten entre miles de libros: se comparte una sola copia
+        self.meta = (sys.intern(self.meta[0]), self.meta[1])
+        self.categoria = sys.intern(self.categoria)
+
     @property
     def autor(self) -> str:
         return self.meta[0]
@@ -27,139 +83,2090 @@ class Libro:
 # --------------------------
 # Clase Usuario
 # --------------------------
-@dataclass
+@dataclass(slots=True)
 class Usuario:
     nombre: str
     user_id: str
-    # lista de ISBN de libros prestados (estructura mutable)
-    libros_prestados: List[str] = field(default_factory=list)
+    # ISBN de libros prestados como conjunto ordenado (dict con valores None):
+    # altas y bajas en O(1) conservando el orden de préstamo
+    libros_prestados: Dict[str, None] = field(default_factory=dict)
+
+    def __post_init__(self):
+        # admite también una lista de ISBN
+        self.libros_prestados = dict.fromkeys(self.libros_prestados)
 
     def __repr__(self):
         return f"<Usuario {self.nombre!r} (ID: {self.user_id}) | Prestados: {len(self.libros_prestados)}>"
 
+# --------------------------
+# Sumideros de eventos
+# --------------------------
+@dataclass(slots=True)
+class Evento:
+    """
+    Resultado de una operación pública: tipo ("Prestar", "Devolver", ...),
+    código ESTADO_* y datos. El texto para la consola solo se construye al
+    pedir mensaje(), así que los sumideros que no lo usan no pagan el formato.
+    """
+    tipo: str
+    estado: int
+    plantilla: str   # str.format sobre datos
+    datos: dict
+
+    def mensaje(self) -> str:
+        error = "" if self.estado == ESTADO_OK else "ERROR: "
+        return f"[{self.tipo}] {error}{self.plantilla.format(**self.datos)}"
+
+class _Fecha(float):
+    """Marca de tiempo (segundos epoch) que se muestra con time.ctime y se guarda como número."""
+    __slots__ = ()
+
+    def __str__(self):
+        return time.ctime(self)
+
+def _a_json(valor):
+    """Datos de un evento en forma serializable: Libro y Usuario pasan a diccionarios."""
+    if isinstance(valor, Libro):
+        return {"isbn": valor.isbn, "autor": valor.autor, "titulo": valor.titulo,
+                "categoria": valor.categoria, "prestado": valor.is_borrowed}
+    if isinstance(valor, Usuario):
+        return {"user_id": valor.user_id, "nombre": valor.nombre}
+    return valor
+
+class SumideroConsola:
+    """Sumidero por defecto: imprime cada evento en la consola."""
+    activo = True
+
+    def emitir(self, evento: Evento) -> None:
+        print(evento.mensaje())
+
+    def cerrar(self) -> None:
+        pass
+
+class SumideroNulo:
+    """Descarta los eventos sin llegar a crearlos (procesos por lotes)."""
+    activo = False
+
+    def emitir(self, evento: Evento) -> None:
+        pass
+
+    def cerrar(self) -> None:
+        pass
+
+class SumideroJSONL:
+    """
+    Añade los eventos a `ruta` como líneas JSON {"t", "tipo", "estado", datos...}.
+    emitir() solo copia los datos a una cola; un hilo en segundo plano los
+    serializa y escribe cada `intervalo` segundos, o antes si se acumulan
+    `capacidad` eventos. cerrar() vuelca lo pendiente y cierra el archivo.
+    """
+    activo = True
+
+    def __init__(self, ruta: str, intervalo: float = 0.5, capacidad: int = 10_000):
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self.capacidad = capacidad
+        self._pendientes: deque = deque()
+        self._codificar = json.JSONEncoder(ensure_ascii=False).encode  # json.dumps crearía uno por línea
+        self._archivo = open(ruta, "a", encoding="utf-8")
+        self._cerrojo = threading.Lock()   # un volcado cada vez
+        self._despertar = threading.Event()
+        self._cerrado = False
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def emitir(self, evento: Evento) -> None:
+        # Libro y Usuario se copian ya: al volcar podrían haber cambiado
+        datos = {clave: _a_json(valor) for clave, valor in evento.datos.items()}
+        self._pendientes.append((time.time(), evento.tipo, evento.estado, datos))
+        if len(self._pendientes) >= self.capacidad:
+            self._despertar.set()
+
+    def _bucle(self) -> None:
+        while not self._cerrado:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            self.volcar()
+
+    def volcar(self) -> None:
+        """Escribe ya todos los eventos pendientes."""
+        with self._cerrojo:
+            pendientes = self._pendientes
+            lineas = []
+            while pendientes:
+                t, tipo, estado, datos = pendientes.popleft()
+                lineas.append(self._codificar({"t": t, "tipo": tipo, "estado": estado, **datos}))
+            if lineas:
+                self._archivo.write("\n".join(lineas) + "\n")
+                self._archivo.flush()
+
+    def cerrar(self) -> None:
+        if self._cerrado:
+            return
+        self._cerrado = True
+        self._despertar.set()
+        self._hilo.join()
+        self.volcar()
+        self._archivo.close()
+
+def _emitir(sumidero, tipo: str, estado: int, plantilla: str, **datos) -> None:
+    if sumidero.activo:
+        sumidero.emitir(Evento(tipo, estado, plantilla, datos))
+
+# --------------------------
+# Catálogo compacto
+# --------------------------
+class LibroVista(Libro):
+    """
+    Libro respaldado por una fila de CatalogoCompacto: lee los campos de las
+    columnas y escribe is_borrowed directamente en ellas. Al serializarse
+    (pickle) se convierte en un Libro normal.
+    """
+    __slots__ = ("_catalogo", "_fila")
+
+    def __init__(self, catalogo: "CatalogoCompacto", fila: int):
+        self._catalogo = catalogo
+        self._fila = fila
+
+    @property
+    def meta(self) -> Tuple[str, str]:
+        c = self._catalogo
+        return c._textos[c._autores[self._fila]], c._titulo(self._fila)
+
+    @property
+    def categoria(self) -> str:
+        c = self._catalogo
+        return c._textos[c._categorias[self._fila]]
+
+    @property
+    def isbn(self) -> str:
+        return self._catalogo._isbns[self._fila]
+
+    @property
+    def is_borrowed(self) -> bool:
+        return bool(self._catalogo._prestados[self._fila])
+
+    @is_borrowed.setter
+    def is_borrowed(self, valor: bool) -> None:
+        self._catalogo._prestados[self._fila] = bool(valor)
+
+    def __reduce__(self):
+        return Libro, (self.meta, self.categoria, self.isbn, self.is_borrowed)
+
+class CatalogoCompacto(MutableMapping):
+    """
+    Almacén en columnas para catálogos de millones de libros, usable como el
+    dict isbn -> Libro de Biblioteca (Biblioteca(compacto=True)). Autor y
+    categoría son índices (array 'I') a una tabla de textos sin repetidos,
+    los títulos van en un montón UTF-8 con desplazamientos y el estado de
+    préstamo en un bytearray. Cada acceso devuelve una LibroVista nueva.
+    Las filas de libros quitados se reutilizan; el montón no se compacta.
+    """
+    def __init__(self):
+        self._filas: Dict[str, int] = {}          # isbn -> fila
+        self._isbns: List[Optional[str]] = []     # fila -> isbn (None si libre)
+        self._autores = array("I")
+        self._categorias = array("I")
+        self._titulo_desp = array("Q")
+        self._titulo_largo = array("I")
+        self._prestados = bytearray()
+        self._monton = bytearray()
+        self._textos: List[str] = []
+        self._ids_texto: Dict[str, int] = {}
+        self._libres: List[int] = []
+
+    def _id_texto(self, texto: str) -> int:
+        id_texto = self._ids_texto.get(texto)
+        if id_texto is None:
+            id_texto = self._ids_texto[texto] = len(self._textos)
+            self._textos.append(texto)
+        return id_texto
+
+    def _titulo(self, fila: int) -> str:
+        inicio = self._titulo_desp[fila]
+        return self._monton[inicio:inicio + self._titulo_largo[fila]].decode("utf-8")
+
+    def __setitem__(self, isbn: str, libro: Libro) -> None:
+        titulo = libro.titulo.encode("utf-8")
+        autor, categoria = self._id_texto(libro.autor), self._id_texto(libro.categoria)
+        desplazamiento = len(self._monton)
+        self._monton += titulo
+        fila = self._filas.get(isbn)
+        if fila is None and self._libres:
+            fila = self._libres.pop()
+        if fila is None:
+            self._filas[isbn] = len(self._isbns)
+            self._isbns.append(isbn)
+            self._autores.append(autor)
+            self._categorias.append(categoria)
+            self._titulo_desp.append(desplazamiento)
+            self._titulo_largo.append(len(titulo))
+            self._prestados.append(bool(libro.is_borrowed))
+        else:
+            self._filas[isbn] = fila
+            self._isbns[fila] = isbn
+            self._autores[fila] = autor
+            self._categorias[fila] = categoria
+            self._titulo_desp[fila] = desplazamiento
+            self._titulo_largo[fila] = len(titulo)
+            self._prestados[fila] = bool(libro.is_borrowed)
+
+    def __getitem__(self, isbn: str) -> LibroVista:
+        return LibroVista(self, self._filas[isbn])
+
+    def get(self, isbn: str, default=None):
+        fila = self._filas.get(isbn)
+        return default if fila is None else LibroVista(self, fila)
+
+    def __contains__(self, isbn) -> bool:
+        return isbn in self._filas
+
+    def __delitem__(self, isbn: str) -> None:
+        fila = self._filas.pop(isbn)
+        self._isbns[fila] = None
+        self._libres.append(fila)
+
+    def __iter__(self):
+        return iter(self._filas)
+
+    def __len__(self) -> int:
+        return len(self._filas)
+
+# --------------------------
+# Índice de búsqueda
+# --------------------------
+def trigramas(texto: str) -> set:
+    """Conjunto de subcadenas de 3 caracteres de un texto."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class IndiceTrigramas:
+    """
+    Índice invertido de un campo de texto (en minúsculas): trigrama -> ISBNs.
+    Un texto de 3 o más caracteres solo puede estar contenido en valores que
+    tengan todos sus trigramas; los candidatos se verifican después. Las
+    listas son diccionarios para conservar el orden de alta.
+    """
+    def __init__(self, internar: bool = False):
+        self.valores: Dict[str, str] = {}               # isbn -> texto en minúsculas
+        self.listas: Dict[str, Dict[str, None]] = {}    # trigrama -> {isbn: None}
+        # internar los textos si se repiten mucho (autor, categoría)
+        self.internar = internar
+
+    def agregar(self, isbn: str, texto: str) -> None:
+        texto = texto.lower()
+        if self.internar:
+            texto = sys.intern(texto)
+        self.valores[isbn] = texto
+        for t in trigramas(texto):
+            self.listas.setdefault(t, {})[isbn] = None
+
+    def quitar(self, isbn: str) -> None:
+        for t in trigramas(self.valores.pop(isbn)):
+            lista = self.listas[t]
+            del lista[isbn]
+            if not lista:
+                del self.listas[t]
+
+def _buscar_isbns(indices, todos, titulo: Optional[str] = None, autor: Optional[str] = None,
+                  categoria: Optional[str] = None) -> List[str]:
+    """
+    ISBN cuyos campos contienen todos los textos dados (sin distinguir
+    mayúsculas). `indices` da por campo un objeto con `listas` y `valores`
+    (un IndiceTrigramas o su versión publicada); `todos()` devuelve el
+    catálogo completo en orden de alta, para cuando ningún texto tiene 3
+    caracteres.
+    """
+    criterios = [(indices[campo], texto.lower())
+                 for campo, texto in (("titulo", titulo), ("autor", autor), ("categoria", categoria))
+                 if texto is not None]
+    listas = []
+    for indice, txt in criterios:
+        for t in trigramas(txt):
+            lista = indice.listas.get(t)
+            if lista is None:
+                return []
+            listas.append(lista)
+    if listas:
+        listas.sort(key=len)
+        menor, resto = listas[0], listas[1:]
+        candidatos = (isbn for isbn in menor if all(isbn in lista for lista in resto))
+    else:
+        candidatos = todos()
+    return [isbn for isbn in candidatos if all(txt in indice.valores[isbn] for indice, txt in criterios)]
+
+# --------------------------
+# Versiones de solo lectura
+# --------------------------
+class VersionMapa(Mapping):
+    """Versión publicada (inmutable) de un MapaCOW: sus cubetas no se vuelven a modificar."""
+    __slots__ = ("_cubetas", "_mascara")
+
+    def __init__(self, cubetas: Tuple[dict, ...]):
+        self._cubetas = cubetas
+        self._mascara = len(cubetas) - 1
+
+    def __getitem__(self, clave):
+        return self._cubetas[hash(clave) & self._mascara][clave]
+
+    def get(self, clave, default=None):
+        return self._cubetas[hash(clave) & self._mascara].get(clave, default)
+
+    def __contains__(self, clave) -> bool:
+        return clave in self._cubetas[hash(clave) & self._mascara]
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._cubetas)
+
+    def __len__(self) -> int:
+        return sum(map(len, self._cubetas))
+
+class MapaCOW(MutableMapping):
+    """
+    Diccionario repartido en NUM_CUBETAS cubetas con copia en escritura.
+    publicar() devuelve una VersionMapa con las cubetas actuales en
+    O(NUM_CUBETAS); después, la primera escritura en cada cubeta la copia en
+    lugar de modificarla, así que las versiones publicadas comparten con la
+    actual todas las cubetas que no han cambiado.
+    """
+    NUM_CUBETAS = 1024  # potencia de 2
+
+    def __init__(self):
+        self._cubetas = [{} for _ in range(self.NUM_CUBETAS)]
+        self._propias = bytearray(b"\1" * self.NUM_CUBETAS)  # 1: no compartida con ninguna versión
+        self._version: Optional[VersionMapa] = None           # última publicación, si no hubo cambios
+
+    def _cubeta_propia(self, clave) -> dict:
+        i = hash(clave) & (self.NUM_CUBETAS - 1)
+        if not self._propias[i]:
+            self._cubetas[i] = dict(self._cubetas[i])
+            self._propias[i] = 1
+        self._version = None
+        return self._cubetas[i]
+
+    def __getitem__(self, clave):
+        return self._cubetas[hash(clave) & (self.NUM_CUBETAS - 1)][clave]
+
+    def get(self, clave, default=None):
+        return self._cubetas[hash(clave) & (self.NUM_CUBETAS - 1)].get(clave, default)
+
+    def __contains__(self, clave) -> bool:
+        return clave in self._cubetas[hash(clave) & (self.NUM_CUBETAS - 1)]
+
+    def __setitem__(self, clave, valor) -> None:
+        self._cubeta_propia(clave)[clave] = valor
+
+    def __delitem__(self, clave) -> None:
+        del self._cubeta_propia(clave)[clave]
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._cubetas)
+
+    def __len__(self) -> int:
+        return sum(map(len, self._cubetas))
+
+    def publicar(self) -> VersionMapa:
+        if self._version is None:
+            self._version = VersionMapa(tuple(self._cubetas))
+            self._propias = bytearray(self.NUM_CUBETAS)
+        return self._version
+
+class _ListaVersionada:
+    """
+    Lista de un trigrama compartida por todas las versiones sin copiarla: cada
+    alta añade una entrada al final con el número de la versión que la
+    incluye; una baja no borra, anota en la entrada viva del ISBN la versión
+    desde la que ya no está. Una versión v ve la entrada i si
+    altas[i] <= v < bajas[i]; un ISBN dado de alta de nuevo tiene una entrada
+    por cada alta, cada una con su intervalo. Cuando las entradas muertas
+    superan a las vivas se crea una lista nueva con solo las vivas (las
+    versiones anteriores conservan la vieja), así que alta y baja cuestan
+    O(1) amortizado.
+    """
+    __slots__ = ("isbns", "altas", "bajas", "entradas", "vivos")
+
+    def __init__(self):
+        self.isbns: List[str] = []                    # en orden de alta
+        self.altas: List[int] = []
+        self.bajas: List[Optional[int]] = []          # None mientras la entrada está viva
+        self.entradas: Dict[str, Tuple[int, ...]] = {}  # isbn -> posiciones de sus entradas
+        self.vivos = 0
+
+    def agregar(self, isbn: str, sello: int) -> None:
+        # el ISBN se añade el último: quien recorre isbns ya encuentra su alta y su baja
+        self.altas.append(sello)
+        self.bajas.append(None)
+        self.isbns.append(isbn)
+        self.entradas[isbn] = self.entradas.get(isbn, ()) + (len(self.isbns) - 1,)
+        self.vivos += 1
+
+    def quitar(self, isbn: str, sello: int) -> None:
+        self.bajas[self.entradas[isbn][-1]] = sello
+        self.vivos -= 1
+
+    def visible(self, i: int, numero: int) -> bool:
+        baja = self.bajas[i]
+        return self.altas[i] <= numero and (baja is None or baja > numero)
+
+    def necesita_compactar(self) -> bool:
+        return len(self.isbns) > 2 * self.vivos + 32
+
+    def compactada(self) -> "_ListaVersionada":
+        nueva = _ListaVersionada()
+        for isbn, alta, baja in zip(self.isbns, self.altas, self.bajas):
+            if baja is None:
+                nueva.agregar(isbn, alta)
+        return nueva
+
+class _VistaLista:
+    """Una _ListaVersionada tal como la ve la versión `numero`, con la interfaz de las listas de IndiceTrigramas."""
+    __slots__ = ("_lista", "_numero")
+
+    def __init__(self, lista: _ListaVersionada, numero: int):
+        self._lista = lista
+        self._numero = numero
+
+    def __len__(self) -> int:
+        return self._lista.vivos  # aproximado: solo sirve para empezar por la lista menor
+
+    def __contains__(self, isbn) -> bool:
+        lista = self._lista
+        return any(lista.visible(i, self._numero) for i in lista.entradas.get(isbn, ()))
+
+    def __iter__(self):
+        lista = self._lista
+        for i, isbn in enumerate(lista.isbns):
+            if lista.visible(i, self._numero):
+                yield isbn
+
+class _ListasVersion:
+    """trigrama -> _VistaLista de una versión."""
+    __slots__ = ("_listas", "_numero")
+
+    def __init__(self, listas: VersionMapa, numero: int):
+        self._listas = listas
+        self._numero = numero
+
+    def get(self, trigrama: str):
+        lista = self._listas.get(trigrama)
+        return None if lista is None else _VistaLista(lista, self._numero)
+
+@dataclass(frozen=True)
+class _VersionIndice:
+    valores: VersionMapa      # isbn -> texto en minúsculas
+    listas: _ListasVersion    # trigrama -> ISBNs visibles en la versión
+
+class _IndiceVersionado:
+    """
+    Copia de un IndiceTrigramas para las versiones: textos en un MapaCOW y
+    una _ListaVersionada por trigrama, que se comparte entre versiones en
+    lugar de copiarse. `sello` es el número de la versión que incluirá el cambio.
+    """
+    def __init__(self):
+        self.valores = MapaCOW()
+        self.listas = MapaCOW()
+
+    def agregar(self, isbn: str, texto: str, sello: int) -> None:
+        self.valores[isbn] = texto
+        for t in trigramas(texto):
+            lista = self.listas.get(t)
+            if lista is None:
+                lista = self.listas[t] = _ListaVersionada()
+            lista.agregar(isbn, sello)
+
+    def quitar(self, isbn: str, sello: int) -> None:
+        texto = self.valores[isbn]
+        del self.valores[isbn]
+        for t in trigramas(texto):
+            lista = self.listas[t]
+            lista.quitar(isbn, sello)
+            if lista.necesita_compactar():
+                # la lista vieja sigue en las versiones ya publicadas; no se ve la nueva
+                # hasta la próxima, que no necesita las entradas muertas
+                self.listas[t] = lista.compactada()
+
+    def publicar(self, numero: int) -> _VersionIndice:
+        return _VersionIndice(self.valores.publicar(), _ListasVersion(self.listas.publicar(), numero))
+
+class _LibrosVersion(Mapping):
+    """isbn -> Libro de una VersionBiblioteca; cada acceso crea una copia con is_borrowed de esa versión."""
+    def __init__(self, datos: VersionMapa, prestamos: VersionMapa):
+        self._datos = datos          # isbn -> (orden de alta, autor, título, categoría)
+        self._prestamos = prestamos
+
+    def __getitem__(self, isbn: str) -> Libro:
+        _, autor, titulo, categoria = self._datos[isbn]
+        return Libro((autor, titulo), categoria, isbn, self._prestamos[isbn] is not None)
+
+    def __contains__(self, isbn) -> bool:
+        return isbn in self._datos
+
+    def __iter__(self):
+        """En orden de alta."""
+        datos = self._datos
+        return iter(sorted(datos, key=lambda isbn: datos[isbn][0]))
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+class VersionBiblioteca:
+    """
+    Estado de una Biblioteca en un instante, devuelto por Biblioteca.snapshot().
+    Libros, préstamos y préstamos de cada usuario son siempre coherentes entre
+    sí y no cambian con las escrituras posteriores; las lecturas no toman
+    ningún cerrojo. Las búsquedas y listados no imprimen nada.
+    """
+    def __init__(self, numero: int, libros: VersionMapa, prestamos: VersionMapa,
+                 usuarios: VersionMapa, indices: Dict[str, _VersionIndice]):
+        self.numero = numero
+        self.libros = _LibrosVersion(libros, prestamos)
+        self.prestamos = prestamos      # isbn -> user_id (None si disponible)
+        self._usuarios = usuarios       # user_id -> (nombre, ISBN prestados en orden)
+        self._indices = indices
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._usuarios
+
+    def buscar(self, titulo: Optional[str] = None, autor: Optional[str] = None,
+               categoria: Optional[str] = None) -> List[Libro]:
+        """Como Biblioteca.buscar, sobre esta versión."""
+        return [self.libros[isbn] for isbn in _buscar_isbns(self._indices, lambda: iter(self.libros),
+                                                            titulo, autor, categoria)]
+
+    def buscar_por_titulo(self, texto: str) -> List[Libro]:
+        return self.buscar(titulo=texto)
+
+    def buscar_por_autor(self, autor: str) -> List[Libro]:
+        return self.buscar(autor=autor)
+
+    def buscar_por_categoria(self, categoria: str) -> List[Libro]:
+        return self.buscar(categoria=categoria)
+
+    def listar_prestados_usuario(self, user_id: str) -> List[Libro]:
+        """Libros prestados al usuario en esta versión ([] si no existe)."""
+        usuario = self._usuarios.get(user_id)
+        return [] if usuario is None else [self.libros[isbn] for isbn in usuario[1]]
+
+class _Versionado:
+    """
+    Copia en MapaCOW de lo que leen las versiones: datos de libros, préstamos,
+    préstamos por usuario e índices. Biblioteca la crea en el primer
+    snapshot() y la actualiza en cada escritura confirmada; hasta entonces
+    las escrituras no pagan nada. publicar() reutiliza la última versión si
+    no ha habido escrituras desde entonces.
+    """
+    def __init__(self, biblioteca: "Biblioteca"):
+        self._orden = itertools.count()
+        self.libros = MapaCOW()
+        self.prestamos = MapaCOW()
+        self.usuarios = MapaCOW()
+        self.indices = {campo: _IndiceVersionado() for campo in biblioteca.indices}
+        self.numero = 0
+        self.publicada: Optional[VersionBiblioteca] = None   # None si hubo escrituras desde la última
+        self.ultima: Optional[VersionBiblioteca] = None
+        for isbn, libro in biblioteca.libros.items():
+            self.añadir(libro, biblioteca.indices)
+            self.prestamos[isbn] = biblioteca.prestamos[isbn]
+        for user_id, usuario in biblioteca.usuarios.items():
+            self.usuarios[user_id] = (usuario.nombre, tuple(usuario.libros_prestados))
+
+    def añadir(self, libro: Libro, indices: Dict[str, IndiceTrigramas]) -> None:
+        self.libros[libro.isbn] = (next(self._orden), libro.autor, libro.titulo, libro.categoria)
+        self.prestamos[libro.isbn] = None
+        for campo, indice in self.indices.items():
+            # el texto ya en minúsculas; el cambio entra en la próxima versión publicada
+            indice.agregar(libro.isbn, indices[campo].valores[libro.isbn], self.numero + 1)
+        self.publicada = None
+
+    def quitar(self, isbn: str) -> None:
+        del self.libros[isbn]
+        del self.prestamos[isbn]
+        for indice in self.indices.values():
+            indice.quitar(isbn, self.numero + 1)
+        self.publicada = None
+
+    def registrar_usuario(self, usuario: Usuario) -> None:
+        self.usuarios[usuario.user_id] = (usuario.nombre, tuple(usuario.libros_prestados))
+        self.publicada = None
+
+    def dar_baja(self, user_id: str) -> None:
+        del self.usuarios[user_id]
+        self.publicada = None
+
+    def prestar(self, isbn: str, user_id: str) -> None:
+        self.prestamos[isbn] = user_id
+        nombre, prestados = self.usuarios[user_id]
+        self.usuarios[user_id] = (nombre, prestados + (isbn,))
+        self.publicada = None
+
+    def devolver(self, isbn: str, user_id: str) -> None:
+        self.prestamos[isbn] = None
+        nombre, prestados = self.usuarios[user_id]
+        self.usuarios[user_id] = (nombre, tuple(i for i in prestados if i != isbn))
+        self.publicada = None
+
+    def publicar(self) -> VersionBiblioteca:
+        if self.publicada is None:
+            self.numero += 1
+            self.publicada = VersionBiblioteca(
+                self.numero, self.libros.publicar(), self.prestamos.publicar(), self.usuarios.publicar(),
+                {campo: indice.publicar(self.numero) for campo, indice in self.indices.items()})
+            self.ultima = self.publicada
+        return self.publicada
+
 # --------------------------
 # Clase Biblioteca
 # --------------------------
+def _sincronizado(metodo):
+    """
+    Ejecuta el método con el cerrojo de la biblioteca y, antes de devolver el
+    resultado, lleva a disco (flush + fsync) lo que haya escrito en el diario.
+    """
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._cerrojo:
+            try:
+                return metodo(self, *args, **kwargs)
+            finally:
+                if self._diario is not None:
+                    if self._sin_sincronizar:
+                        self._diario.flush()
+                        os.fsync(self._diario.fileno())
+                        self._sin_sincronizar = False
+                    if self._registros_diario >= self.umbral_compactacion:
+                        self.compactar(en_segundo_plano=True)
+    return envoltura
+
 class Biblioteca:
-    def __init__(self):
-        # diccionario para acceso eficiente por ISBN
-        self.libros: Dict[str, Libro] = {}
+    # campos indexados para las búsquedas
+    CAMPOS_BUSQUEDA = ("titulo", "autor", "categoria")
+
+    def __init__(self, ruta: Optional[str] = None, umbral_compactacion: int = 100_000,
+                 dias_prestamo: int = 14, compacto: bool = False, sumidero=None):
+        """
+        Sin ruta la biblioteca vive solo en memoria. Con ruta se recupera de
+        la instantánea y del diario, y registra cada operación confirmada;
+        al superar umbral_compactacion registros se compacta en segundo plano.
+        Los préstamos vencen a los dias_prestamo días. Con compacto=True los
+        libros se guardan en un CatalogoCompacto, que devuelve vistas.
+        Los mensajes de las operaciones van a `sumidero` (SumideroConsola por
+        defecto; SumideroNulo o SumideroJSONL para lotes), que cierra quien lo crea.
+        """
+        self.sumidero = sumidero if sumidero is not None else SumideroConsola()
+        # diccionario (o catálogo compacto) para acceso eficiente por ISBN
+        self.libros: Dict[str, Libro] = CatalogoCompacto() if compacto else {}
         # diccionario de usuarios por ID
         self.usuarios: Dict[str, Usuario] = {}
         # conjunto para IDs únicos
         self.user_ids: set = set()
         # mapa de préstamos: isbn -> user_id (None si disponible)
         self.prestamos: Dict[str, Optional[str]] = {}
+        # un índice de trigramas por campo de búsqueda
+        self.indices: Dict[str, IndiceTrigramas] = {campo: IndiceTrigramas(internar=campo != "titulo")
+                                                    for campo in self.CAMPOS_BUSQUEDA}
+        # vencimientos: isbn -> (prestado, vence, secuencia) de cada préstamo activo.
+        # Los heaps guardan (vence, secuencia, isbn) con borrado perezoso: una
+        # entrada solo vale si su secuencia coincide con la del préstamo actual.
+        self.duracion_prestamo = dias_prestamo * 86400
+        self.vencimientos: Dict[str, Tuple[float, float, int]] = {}
+        # Los préstamos se reparten en dos heaps por _corte, el mayor `ahora`
+        # consultado: los que ya habían vencido entonces y los demás, para que
+        # proximos_a_vencer no recorra los vencidos.
+        self._heap_vencidos: List[Tuple[float, int, str]] = []
+        self._heap_vencimientos: List[Tuple[float, int, str]] = []
+        self._corte = float("-inf")
+        self._avisos: List[Tuple[float, int, str]] = []   # pendientes de avisar; se vacía al avisar
+        self._secuencia = 0
+        # persistencia (instantánea + diario por generaciones)
+        self.ruta = ruta
+        self.umbral_compactacion = umbral_compactacion
+        self._cerrojo = threading.RLock()
+        self._diario = None
+        self._generacion = 0
+        self._registros_diario = 0
+        self._sin_sincronizar = False   # hay registros en el diario aún sin fsync
+        self._hilo_compactacion: Optional[threading.Thread] = None
+        # copia versionada para snapshot(); se crea con la primera instantánea de lectura
+        self._versionado: Optional[_Versionado] = None
+        if ruta is not None:
+            self._recuperar()
+
+    # --- Persistencia ---
+    def _registrar(self, registro: list) -> None:
+        """Añade una operación confirmada al diario (si hay persistencia)."""
+        if self._diario is not None:
+            self._diario.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            self._registros_diario += 1
+            self._sin_sincronizar = True
+
+    def _ruta_diario(self, generacion: int) -> str:
+        return f"{self.ruta}.wal.{generacion}"
+
+    def _generaciones_diario(self) -> List[int]:
+        generaciones = []
+        for ruta in glob.glob(glob.escape(self.ruta) + ".wal.*"):
+            sufijo = ruta.rsplit(".", 1)[1]
+            if sufijo.isdigit():
+                generaciones.append(int(sufijo))
+        return sorted(generaciones)
+
+    def _recuperar(self) -> None:
+        """
+        Carga la instantánea y reproduce las generaciones del diario que no
+        cubre. Una última línea sin terminar (escritura cortada) no llegó a
+        confirmarse: se descarta y se trunca el archivo antes de seguir
+        escribiendo en él. Cualquier otra línea ilegible es corrupción y lanza
+        ValueError, igual que una instantánea de otra versión del formato.
+        """
+        generacion = 0
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+            version = datos.get("version") if isinstance(datos, dict) else None
+            if version != VERSION_INSTANTANEA:
+                raise ValueError(f"Instantánea {self.ruta} con versión de formato {version!r}; "
+                                 f"se esperaba {VERSION_INSTANTANEA}.")
+            generacion = datos["generacion"]
+            for autor, titulo, categoria, isbn in datos["libros"]:
+                self._añadir(Libro((autor, titulo), categoria, isbn))
+            for nombre, user_id in datos["usuarios"]:
+                self._registrar_usuario(Usuario(nombre, user_id))
+            for isbn, user_id, *fechas in datos["prestamos"]:
+                self._prestar(isbn, user_id, *fechas)
+        except FileNotFoundError:
+            pass
+        operaciones = {
+            "AL": lambda autor, titulo, categoria, isbn: self._añadir(Libro((autor, titulo), categoria, isbn)),
+            "QL": self._quitar,
+            "RU": lambda nombre, user_id: self._registrar_usuario(Usuario(nombre, user_id)),
+            "BU": self._dar_baja,
+            "P": self._prestar,
+            "D": self._devolver,
+            "R": lambda isbn, user_id, vence: self._renovar(isbn, user_id, vence=vence),
+        }
+        generaciones = [g for g in self._generaciones_diario() if g >= generacion]
+        for g in generaciones:
+            ruta = self._ruta_diario(g)
+            with open(ruta, "rb") as f:
+                contenido = f.read()
+            inicio = 0
+            for numero, linea in enumerate(contenido.splitlines(keepends=True), 1):
+                if not linea.endswith(b"\n"):
+                    if g != generaciones[-1]:
+                        raise ValueError(f"Diario corrupto: {ruta}, línea {numero} sin terminar.")
+                    # última línea a medio escribir: se quita para no pegarle el próximo registro
+                    os.truncate(ruta, inicio)
+                    break
+                try:
+                    tipo, *argumentos = json.loads(linea)
+                    operacion = operaciones[tipo]
+                except (json.JSONDecodeError, UnicodeDecodeError, KeyError, ValueError, TypeError):
+                    raise ValueError(f"Diario corrupto: {ruta}, línea {numero}.") from None
+                operacion(*argumentos)
+                self._registros_diario += 1
+                inicio += len(linea)
+        self._generacion = generaciones[-1] if generaciones else generacion
+        self._diario = open(self._ruta_diario(self._generacion), "a", encoding="utf-8")
+
+    def _estado(self) -> dict:
+        """Copia compacta de libros, usuarios y préstamos (los demás datos se derivan)."""
+        return {
+            "libros": [(l.autor, l.titulo, l.categoria, l.isbn) for l in self.libros.values()],
+            "usuarios": [(u.nombre, u.user_id) for u in self.usuarios.values()],
+            # en el orden de préstamo de cada usuario
+            "prestamos": [(isbn, u.user_id, *self.vencimientos[isbn][:2])
+                          for u in self.usuarios.values() for isbn in u.libros_prestados],
+        }
+
+    def compactar(self, en_segundo_plano: bool = False) -> None:
+        """
+        Escribe una instantánea nueva y borra las generaciones del diario que
+        ya recoge. Con en_segundo_plano=True el cerrojo solo se retiene para
+        abrir la generación siguiente y copiar el estado; la escritura se hace
+        en un hilo aparte. Si ya hay una compactación en curso no hace nada.
+        """
+        if self.ruta is None:
+            return
+        with self._cerrojo:
+            if self._hilo_compactacion is not None and self._hilo_compactacion.is_alive():
+                return
+            self._diario.close()
+            self._generacion += 1
+            self._diario = open(self._ruta_diario(self._generacion), "a", encoding="utf-8")
+            self._registros_diario = 0
+            estado = self._estado()
+            estado["generacion"] = self._generacion
+            if en_segundo_plano:
+                self._hilo_compactacion = threading.Thread(
+                    target=self._escribir_instantanea, args=(estado,), daemon=True)
+                self._hilo_compactacion.start()
+            else:
+                self._escribir_instantanea(estado)
+
+    def _escribir_instantanea(self, estado: dict) -> None:
+        estado["version"] = VERSION_INSTANTANEA
+        tmp = self.ruta + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(estado, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.ruta)
+        for g in self._generaciones_diario():
+            if g < estado["generacion"]:
+                os.remove(self._ruta_diario(g))
+
+    def cerrar(self) -> None:
+        """Espera a la compactación en curso y cierra el diario."""
+        if self._hilo_compactacion is not None:
+            self._hilo_compactacion.join()
+        with self._cerrojo:
+            if self._diario is not None:
+                self._diario.close()
+                self._diario = None
 
     # --- Gestión de libros ---
-    def añadir_libro(self, libro: Libro) -> bool:
-        """Añade un libro al catálogo. Devuelve True si se añadió, False si ya existía ISBN."""
+    def _añadir(self, libro: Libro) -> int:
         if libro.isbn in self.libros:
-            print(f"[Añadir libro] ERROR: ISBN {libro.isbn} ya existe en la biblioteca.")
-            return False
+            return ESTADO_YA_EXISTE
         self.libros[libro.isbn] = libro
         self.prestamos[libro.isbn] = None
-        print(f"[Añadir libro] Libro añadido: {libro}")
-        return True
+        for campo, indice in self.indices.items():
+            indice.agregar(libro.isbn, getattr(libro, campo))
+        if self._versionado is not None:
+            self._versionado.añadir(libro, self.indices)
+        self._registrar(["AL", libro.autor, libro.titulo, libro.categoria, libro.isbn])
+        return ESTADO_OK
 
-    def quitar_libro(self, isbn: str) -> bool:
-        """Quita un libro del catálogo si existe y no está prestado."""
-        if isbn not in self.libros:
-            print(f"[Quitar libro] ERROR: ISBN {isbn} no encontrado.")
-            return False
-        if self.libros[isbn].is_borrowed:
-            print(f"[Quitar libro] ERROR: ISBN {isbn} está actualmente prestado; no puede eliminarse.")
-            return False
+    def _quitar(self, isbn: str) -> int:
+        libro = self.libros.get(isbn)
+        if libro is None:
+            return ESTADO_LIBRO_NO_EXISTE
+        if libro.is_borrowed:
+            return ESTADO_YA_PRESTADO
         del self.libros[isbn]
         del self.prestamos[isbn]
-        print(f"[Quitar libro] Libro con ISBN {isbn} eliminado del catálogo.")
+        for indice in self.indices.values():
+            indice.quitar(isbn)
+        if self._versionado is not None:
+            self._versionado.quitar(isbn)
+        self._registrar(["QL", isbn])
+        return ESTADO_OK
+
+    @_sincronizado
+    def añadir_libro(self, libro: Libro) -> bool:
+        """Añade un libro al catálogo. Devuelve True si se añadió, False si ya existía ISBN."""
+        if self._añadir(libro) == ESTADO_YA_EXISTE:
+            _emitir(self.sumidero, "Añadir libro", ESTADO_YA_EXISTE,
+                    "ISBN {isbn} ya existe en la biblioteca.", isbn=libro.isbn)
+            return False
+        _emitir(self.sumidero, "Añadir libro", ESTADO_OK, "Libro añadido: {libro}", libro=libro)
         return True
 
+    @_sincronizado
+    def quitar_libro(self, isbn: str) -> bool:
+        """Quita un libro del catálogo si existe y no está prestado."""
+        estado = self._quitar(isbn)
+        if estado == ESTADO_LIBRO_NO_EXISTE:
+            _emitir(self.sumidero, "Quitar libro", ESTADO_LIBRO_NO_EXISTE, "ISBN {isbn} no encontrado.", isbn=isbn)
+        elif estado == ESTADO_YA_PRESTADO:
+            _emitir(self.sumidero, "Quitar libro", ESTADO_YA_PRESTADO,
+                    "ISBN {isbn} está actualmente prestado; no puede eliminarse.", isbn=isbn)
+        else:
+            _emitir(self.sumidero, "Quitar libro", ESTADO_OK,
+                    "Libro con ISBN {isbn} eliminado del catálogo.", isbn=isbn)
+        return estado == ESTADO_OK
+
     # --- Gestión de usuarios ---
-    def registrar_usuario(self, usuario: Usuario) -> bool:
-        """Registra un usuario si su ID es único."""
+    def _registrar_usuario(self, usuario: Usuario) -> int:
         if usuario.user_id in self.user_ids:
-            print(f"[Registrar usuario] ERROR: ID {usuario.user_id} ya registrado.")
-            return False
+            return ESTADO_YA_EXISTE
         self.user_ids.add(usuario.user_id)
         self.usuarios[usuario.user_id] = usuario
-        print(f"[Registrar usuario] Usuario registrado: {usuario}")
-        return True
+        if self._versionado is not None:
+            self._versionado.registrar_usuario(usuario)
+        self._registrar(["RU", usuario.nombre, usuario.user_id])
+        return ESTADO_OK
 
-    def dar_baja_usuario(self, user_id: str) -> bool:
-        """Da de baja a un usuario solo si no tiene libros prestados."""
+    def _dar_baja(self, user_id: str) -> int:
         if user_id not in self.user_ids:
-            print(f"[Dar de baja] ERROR: Usuario {user_id} no existe.")
-            return False
+            return ESTADO_USUARIO_NO_REGISTRADO
         if self.usuarios[user_id].libros_prestados:
-            print(f"[Dar de baja] ERROR: Usuario {user_id} tiene libros prestados; no puede darse de baja.")
-            return False
+            return ESTADO_USUARIO_CON_PRESTAMOS
         self.user_ids.remove(user_id)
         del self.usuarios[user_id]
-        print(f"[Dar de baja] Usuario {user_id} ha sido dado de baja.")
+        if self._versionado is not None:
+            self._versionado.dar_baja(user_id)
+        self._registrar(["BU", user_id])
+        return ESTADO_OK
+
+    @_sincronizado
+    def registrar_usuario(self, usuario: Usuario) -> bool:
+        """Registra un usuario si su ID es único."""
+        if self._registrar_usuario(usuario) == ESTADO_YA_EXISTE:
+            _emitir(self.sumidero, "Registrar usuario", ESTADO_YA_EXISTE,
+                    "ID {user_id} ya registrado.", user_id=usuario.user_id)
+            return False
+        _emitir(self.sumidero, "Registrar usuario", ESTADO_OK, "Usuario registrado: {usuario}", usuario=usuario)
         return True
 
+    @_sincronizado
+    def dar_baja_usuario(self, user_id: str) -> bool:
+        """Da de baja a un usuario solo si no tiene libros prestados."""
+        estado = self._dar_baja(user_id)
+        if estado == ESTADO_USUARIO_NO_REGISTRADO:
+            _emitir(self.sumidero, "Dar de baja", ESTADO_USUARIO_NO_REGISTRADO,
+                    "Usuario {user_id} no existe.", user_id=user_id)
+        elif estado == ESTADO_USUARIO_CON_PRESTAMOS:
+            _emitir(self.sumidero, "Dar de baja", ESTADO_USUARIO_CON_PRESTAMOS,
+                    "Usuario {user_id} tiene libros prestados; no puede darse de baja.", user_id=user_id)
+        else:
+            _emitir(self.sumidero, "Dar de baja", ESTADO_OK,
+                    "Usuario {user_id} ha sido dado de baja.", user_id=user_id)
+        return estado == ESTADO_OK
+
     # --- Préstamos ---
-    def prestar_libro(self, isbn: str, user_id: str) -> bool:
-        """Presta un libro a un usuario si está disponible y ambos existen."""
-        if isbn not in self.libros:
-            print(f"[Prestar] ERROR: ISBN {isbn} no existe.")
-            return False
+    def _prestar(self, isbn: str, user_id: str, ahora: Optional[float] = None,
+                 vence: Optional[float] = None) -> int:
+        """
+        Valida y realiza un préstamo sin imprimir; devuelve un código ESTADO_*.
+        Por defecto se presta en este instante y vence tras duracion_prestamo.
+        """
+        libro = self.libros.get(isbn)
+        if libro is None:
+            return ESTADO_LIBRO_NO_EXISTE
         if user_id not in self.user_ids:
-            print(f"[Prestar] ERROR: Usuario {user_id} no registrado.")
-            return False
-        libro = self.libros[isbn]
+            return ESTADO_USUARIO_NO_REGISTRADO
         if libro.is_borrowed:
-            print(f"[Prestar] ERROR: Libro {isbn} ya está prestado a {self.prestamos[isbn]}.")
-            return False
-        # realizar préstamo
+            return ESTADO_YA_PRESTADO
+        ahora, vence = self._prestar_ejemplar(libro, user_id, ahora, vence)
+        self.usuarios[user_id].libros_prestados[isbn] = None
+        if self._versionado is not None:
+            self._versionado.prestar(isbn, user_id)
+        self._registrar(["P", isbn, user_id, ahora, vence])
+        return ESTADO_OK
+
+    def _prestar_ejemplar(self, libro: Libro, user_id: str, ahora: Optional[float],
+                          vence: Optional[float]) -> Tuple[float, float]:
+        """Parte del préstamo que solo toca datos del libro; devuelve (prestado, vence)."""
         libro.is_borrowed = True
-        self.prestamos[isbn] = user_id
-        self.usuarios[user_id].libros_prestados.append(isbn)
-        print(f"[Prestar] Libro {libro.titulo!r} (ISBN {isbn}) prestado a usuario {user_id}.")
-        return True
+        self.prestamos[libro.isbn] = user_id
+        if ahora is None:
+            ahora = time.time()
+        if vence is None:
+            vence = ahora + self.duracion_prestamo
+        self._fijar_vencimiento(libro.isbn, ahora, vence)
+        return ahora, vence
 
+    def _devolver_ejemplar(self, libro: Libro) -> None:
+        """Parte de la devolución que solo toca datos del libro."""
+        libro.is_borrowed = False
+        self.prestamos[libro.isbn] = None
+        del self.vencimientos[libro.isbn]  # sus entradas en los heaps quedan obsoletas
+        self._depurar_vencimientos()
+
+    def _devolver(self, isbn: str, user_id: str) -> int:
+        """Valida y realiza una devolución sin imprimir; devuelve un código ESTADO_*."""
+        libro = self.libros.get(isbn)
+        if libro is None:
+            return ESTADO_LIBRO_NO_EXISTE
+        if self.prestamos[isbn] != user_id:
+            return ESTADO_NO_PRESTADO_A_USUARIO
+        self._devolver_ejemplar(libro)
+        del self.usuarios[user_id].libros_prestados[isbn]
+        if self._versionado is not None:
+            self._versionado.devolver(isbn, user_id)
+        self._registrar(["D", isbn, user_id])
+        return ESTADO_OK
+
+    @_sincronizado
+    def prestar_libro(self, isbn: str, user_id: str, ahora: Optional[float] = None) -> bool:
+        """Presta un libro a un usuario si está disponible y ambos existen."""
+        estado = self._prestar(isbn, user_id, ahora)
+        if estado == ESTADO_LIBRO_NO_EXISTE:
+            _emitir(self.sumidero, "Prestar", ESTADO_LIBRO_NO_EXISTE, "ISBN {isbn} no existe.", isbn=isbn)
+        elif estado == ESTADO_USUARIO_NO_REGISTRADO:
+            _emitir(self.sumidero, "Prestar", ESTADO_USUARIO_NO_REGISTRADO,
+                    "Usuario {user_id} no registrado.", user_id=user_id)
+        elif estado == ESTADO_YA_PRESTADO:
+            _emitir(self.sumidero, "Prestar", ESTADO_YA_PRESTADO,
+                    "Libro {isbn} ya está prestado a {propietario}.", isbn=isbn, propietario=self.prestamos[isbn])
+        else:
+            _emitir(self.sumidero, "Prestar", ESTADO_OK,
+                    "Libro {libro.titulo!r} (ISBN {isbn}) prestado a usuario {user_id}.",
+                    libro=self.libros[isbn], isbn=isbn, user_id=user_id)
+        return estado == ESTADO_OK
+
+    @_sincronizado
     def devolver_libro(self, isbn: str, user_id: str) -> bool:
         """Devuelve un libro: solo si está prestado a ese usuario."""
+        estado = self._devolver(isbn, user_id)
+        if estado == ESTADO_LIBRO_NO_EXISTE:
+            _emitir(self.sumidero, "Devolver", ESTADO_LIBRO_NO_EXISTE,
+                    "ISBN {isbn} no existe en el catálogo.", isbn=isbn)
+        elif estado == ESTADO_NO_PRESTADO_A_USUARIO:
+            _emitir(self.sumidero, "Devolver", ESTADO_NO_PRESTADO_A_USUARIO,
+                    "Libro {isbn} no está prestado a {user_id} (actual: {propietario}).",
+                    isbn=isbn, user_id=user_id, propietario=self.prestamos.get(isbn))
+        else:
+            _emitir(self.sumidero, "Devolver", ESTADO_OK,
+                    "Libro ISBN {isbn} devuelto por usuario {user_id}.", isbn=isbn, user_id=user_id)
+        return estado == ESTADO_OK
+
+    @_sincronizado
+    def procesar_eventos(self, eventos: Iterable[Tuple[str, str, str]]) -> bytearray:
+        """
+        Aplica en bloque eventos (tipo, isbn, user_id), con tipo "prestar" o
+        "devolver", con las mismas validaciones que prestar_libro y
+        devolver_libro pero sin imprimir. Acepta cualquier iterable, por
+        ejemplo las líneas de un export partidas por comas. Devuelve un
+        código ESTADO_* por evento, en orden.
+        """
+        acciones = {"prestar": self._prestar, "devolver": self._devolver}
+        estados = bytearray()
+        anotar = estados.append
+        for evento in eventos:
+            try:
+                tipo, isbn, user_id = evento
+                accion = acciones[tipo]
+            except (KeyError, TypeError, ValueError):
+                anotar(ESTADO_EVENTO_INVALIDO)
+                continue
+            anotar(accion(isbn, user_id))
+        return estados
+
+    # --- Vencimientos ---
+    def _fijar_vencimiento(self, isbn: str, prestado: float, vence: float) -> None:
+        self._secuencia += 1
+        self.vencimientos[isbn] = (prestado, vence, self._secuencia)
+        entrada = (vence, self._secuencia, isbn)
+        heapq.heappush(self._heap_vencidos if vence <= self._corte else self._heap_vencimientos, entrada)
+        heapq.heappush(self._avisos, entrada)
+        self._depurar_vencimientos()
+
+    def _vigente(self, entrada: Tuple[float, int, str]) -> bool:
+        actual = self.vencimientos.get(entrada[2])
+        return actual is not None and actual[2] == entrada[1]
+
+    def _depurar_vencimientos(self) -> None:
+        """Reconstruye un heap cuando las entradas obsoletas superan a las vigentes (coste amortizado O(1))."""
+        limite = 2 * len(self.vencimientos) + 64
+        if len(self._heap_vencidos) + len(self._heap_vencimientos) > limite:
+            self._heap_vencidos = [e for e in self._heap_vencidos if self._vigente(e)]
+            heapq.heapify(self._heap_vencidos)
+            self._heap_vencimientos = [e for e in self._heap_vencimientos if self._vigente(e)]
+            heapq.heapify(self._heap_vencimientos)
+        if len(self._avisos) > limite:
+            self._avisos = [e for e in self._avisos if self._vigente(e)]
+            heapq.heapify(self._avisos)
+
+    def _avanzar_corte(self, ahora: float) -> None:
+        """Pasa al heap de vencidos los préstamos que vencen hasta `ahora`; cada entrada se mueve una sola vez."""
+        if ahora <= self._corte:
+            return
+        self._corte = ahora
+        heap = self._heap_vencimientos
+        while heap and heap[0][0] <= ahora:
+            entrada = heapq.heappop(heap)
+            if self._vigente(entrada):
+                heapq.heappush(self._heap_vencidos, entrada)
+
+    def _entradas_hasta(self, heap: List[Tuple[float, int, str]], limite: float) -> List[Tuple[float, int, str]]:
+        """
+        Entradas vigentes de `heap` con vencimiento <= limite, ordenadas.
+        Recorre el heap desde la raíz y solo baja por los nodos que cumplen,
+        así que el coste depende del número de resultados y no del total de
+        préstamos.
+        """
+        resultado = []
+        pendientes = [0] if heap else []
+        while pendientes:
+            i = pendientes.pop()
+            entrada = heap[i]
+            if entrada[0] > limite:
+                continue
+            if self._vigente(entrada):
+                resultado.append(entrada)
+            hijo = 2 * i + 1
+            pendientes.extend(range(hijo, min(hijo + 2, len(heap))))
+        resultado.sort()
+        return resultado
+
+    @_sincronizado
+    def vencidos(self, ahora: Optional[float] = None) -> List[Tuple[str, str, float]]:
+        """Préstamos vencidos en `ahora` como (isbn, user_id, vence), del más antiguo al más reciente."""
+        if ahora is None:
+            ahora = time.time()
+        self._avanzar_corte(ahora)
+        return [(isbn, self.prestamos[isbn], vence)
+                for vence, _, isbn in self._entradas_hasta(self._heap_vencidos, ahora)]
+
+    @_sincronizado
+    def proximos_a_vencer(self, horizonte: float, ahora: Optional[float] = None) -> List[Tuple[str, str, float]]:
+        """Préstamos aún no vencidos que vencen en los próximos `horizonte` segundos, como (isbn, user_id, vence)."""
+        if ahora is None:
+            ahora = time.time()
+        self._avanzar_corte(ahora)
+        limite = ahora + horizonte
+        entradas = self._entradas_hasta(self._heap_vencimientos, limite)
+        if ahora < self._corte:
+            # consulta anterior a otra ya hecha: lo que vence entre ahora y el
+            # corte está en el heap de vencidos, que solo guarda hasta el corte
+            entradas[:0] = [e for e in self._entradas_hasta(self._heap_vencidos, min(limite, self._corte))
+                            if e[0] > ahora]
+        return [(isbn, self.prestamos[isbn], vence) for vence, _, isbn in entradas]
+
+    def _renovar(self, isbn: str, user_id: str, ahora: Optional[float] = None,
+                 vence: Optional[float] = None) -> int:
         if isbn not in self.libros:
-            print(f"[Devolver] ERROR: ISBN {isbn} no existe en el catálogo.")
-            return False
-        if self.prestamos.get(isbn) != user_id:
-            propietario = self.prestamos.get(isbn)
-            print(f"[Devolver] ERROR: Libro {isbn} no está prestado a {user_id} (actual: {propietario}).")
-            return False
-        # realizar devolución
-        self.libros[isbn].is_borrowed = False
-        self.prestamos[isbn] = None
-        self.usuarios[user_id].libros_prestados.remove(isbn)
-        print(f"[Devolver] Libro ISBN {isbn} devuelto por usuario {user_id}.")
-        return True
+            return ESTADO_LIBRO_NO_EXISTE
+        if self.prestamos[isbn] != user_id:
+            return ESTADO_NO_PRESTADO_A_USUARIO
+        if vence is None:
+            vence = (time.time() if ahora is None else ahora) + self.duracion_prestamo
+        self._fijar_vencimiento(isbn, self.vencimientos[isbn][0], vence)
+        self._registrar(["R", isbn, user_id, vence])
+        return ESTADO_OK
+
+    @_sincronizado
+    def renovar(self, isbn: str, user_id: str, ahora: Optional[float] = None) -> bool:
+        """Renueva un préstamo: vuelve a vencer tras duracion_prestamo contado desde `ahora`."""
+        estado = self._renovar(isbn, user_id, ahora)
+        if estado == ESTADO_LIBRO_NO_EXISTE:
+            _emitir(self.sumidero, "Renovar", ESTADO_LIBRO_NO_EXISTE,
+                    "ISBN {isbn} no existe en el catálogo.", isbn=isbn)
+        elif estado == ESTADO_NO_PRESTADO_A_USUARIO:
+            _emitir(self.sumidero, "Renovar", ESTADO_NO_PRESTADO_A_USUARIO,
+                    "Libro {isbn} no está prestado a {user_id}.", isbn=isbn, user_id=user_id)
+        else:
+            _emitir(self.sumidero, "Renovar", ESTADO_OK,
+                    "Préstamo de ISBN {isbn} renovado hasta {vence}.",
+                    isbn=isbn, vence=_Fecha(self.vencimientos[isbn][1]))
+        return estado == ESTADO_OK
+
+    def proximo_aviso(self) -> Optional[float]:
+        """Momento en que vence el próximo préstamo aún no avisado (para programar avisar_vencidos)."""
+        while self._avisos and not self._vigente(self._avisos[0]):
+            heapq.heappop(self._avisos)
+        return self._avisos[0][0] if self._avisos else None
+
+    @_sincronizado
+    def avisar_vencidos(self, ahora: Optional[float] = None, avisar=None) -> int:
+        """
+        Emite un aviso por cada préstamo que ha vencido desde el último aviso,
+        sacándolo del heap de avisos (O(log n) por aviso, sin recorrer los
+        demás préstamos). `avisar(isbn, user_id, vence)` lo manda por defecto
+        al sumidero.
+        Devuelve el número de avisos emitidos.
+        """
+        if ahora is None:
+            ahora = time.time()
+        avisos = 0
+        while self._avisos and self._avisos[0][0] <= ahora:
+            entrada = heapq.heappop(self._avisos)
+            if not self._vigente(entrada):
+                continue
+            vence, _, isbn = entrada
+            if avisar is None:
+                _emitir(self.sumidero, "Aviso", ESTADO_OK,
+                        "Libro ISBN {isbn} prestado a {user_id} venció el {vence}.",
+                        isbn=isbn, user_id=self.prestamos[isbn], vence=_Fecha(vence))
+            else:
+                avisar(isbn, self.prestamos[isbn], vence)
+            avisos += 1
+        return avisos
+
+    # --- Lecturas consistentes ---
+    @contextlib.contextmanager
+    def snapshot(self):
+        """
+        Uso: `with biblioteca.snapshot() as s: ...`. Da una VersionBiblioteca
+        coherente (un préstamo nunca se ve a medias) que las escrituras
+        posteriores no alteran, con las mismas búsquedas y listados. Mientras
+        no haya escrituras nuevas todas las llamadas comparten la última
+        versión sin tomar el cerrojo. Tras una escritura se publica otra, que
+        comparte con la anterior todo lo no modificado, solo si el cerrojo
+        está libre: si hay un escritor trabajando se da la última versión
+        publicada, así que los lectores nunca esperan ni frenan préstamos.
+        La primera llamada copia el estado a MapaCOW (O(n)) y a partir de ahí
+        cada escritura mantiene también esa copia.
+        """
+        versionado = self._versionado
+        if versionado is None:
+            with self._cerrojo:
+                if self._versionado is None:
+                    self._versionado = _Versionado(self)
+                versionado = self._versionado
+        version = versionado.publicada
+        if version is None:
+            if self._cerrojo.acquire(blocking=versionado.ultima is None):
+                try:
+                    version = versionado.publicar()
+                finally:
+                    self._cerrojo.release()
+            else:
+                version = versionado.ultima
+        yield version
 
     # --- Búsquedas ---
+    def buscar(self, titulo: Optional[str] = None, autor: Optional[str] = None,
+               categoria: Optional[str] = None) -> List[Libro]:
+        """
+        Libros cuyos campos contienen todos los textos dados (sin distinguir
+        mayúsculas), en orden de alta. Intersecta las listas de trigramas de
+        todos los campos empezando por la menor y verifica los candidatos;
+        si ningún texto tiene 3 caracteres se recorre el catálogo.
+        """
+        return [self.libros[isbn] for isbn in _buscar_isbns(self.indices, lambda: iter(self.libros),
+                                                            titulo, autor, categoria)]
+
     def buscar_por_titulo(self, texto: str) -> List[Libro]:
-        txt = texto.lower()
-        resultados = [lib for lib in self.libros.values() if txt in lib.titulo.lower()]
-        print(f"[Buscar título] Encontrados {len(resultados)} resultados para '{texto}'.")
+        resultados = self.buscar(titulo=texto)
+        _emitir(self.sumidero, "Buscar título", ESTADO_OK,
+                "Encontrados {n} resultados para '{texto}'.", n=len(resultados), texto=texto)
         return resultados
 
     def buscar_por_autor(self, autor: str) -> List[Libro]:
-        txt = autor.lower()
-        resultados = [lib for lib in self.libros.values() if txt in lib.autor.lower()]
-        print(f"[Buscar autor] Encontrados {len(resultados)} resultados para '{autor}'.")
+        resultados = self.buscar(autor=autor)
+        _emitir(self.sumidero, "Buscar autor", ESTADO_OK,
+                "Encontrados {n} resultados para '{texto}'.", n=len(resultados), texto=autor)
         return resultados
 
     def buscar_por_categoria(self, categoria: str) -> List[Libro]:
-        txt = categoria.lower()
-        resultados = [lib for lib in self.libros.values() if txt in lib.categoria.lower()]
-        print(f"[Buscar categoría] Encontrados {len(resultados)} resultados para '{categoria}'.")
+        resultados = self.buscar(categoria=categoria)
+        _emitir(self.sumidero, "Buscar categoría", ESTADO_OK,
+                "Encontrados {n} resultados para '{texto}'.", n=len(resultados), texto=categoria)
         return resultados
 
     # --- Listados ---
     def listar_prestados_usuario(self, user_id: str) -> List[Libro]:
         """Devuelve los objetos Libro prestados a un usuario."""
         if user_id not in self.user_ids:
-            print(f"[Listar prestados] ERROR: Usuario {user_id} no existe.")
+            _emitir(self.sumidero, "Listar prestados", ESTADO_USUARIO_NO_REGISTRADO,
+                    "Usuario {user_id} no existe.", user_id=user_id)
             return []
         isbns = self.usuarios[user_id].libros_prestados
         resultados = [self.libros[isbn] for isbn in isbns]
-        print(f"[Listar prestados] Usuario {user_id} tiene {le_
+        _emitir(self.sumidero, "Listar prestados", ESTADO_OK,
+                "Usuario {user_id} tiene {n} libros prestados.", user_id=user_id, n=len(resultados))
+        return resultados
+
+# --------------------------
+# Biblioteca fragmentada en procesos
+# --------------------------
+class _Fragmento:
+    """
+    Lado trabajador de BibliotecaFragmentada: una Biblioteca en memoria con
+    los libros cuyo ISBN y los usuarios cuyo ID caen en este fragmento. Un
+    préstamo se reparte entre el fragmento del libro (is_borrowed, prestamos,
+    vencimientos) y el del usuario (libros_prestados); mientras está en
+    curso, el usuario queda reservado y no puede darse de baja.
+    """
+    def __init__(self, dias_prestamo: int):
+        self.biblioteca = Biblioteca(dias_prestamo=dias_prestamo)
+        self.orden: Dict[str, int] = {}       # isbn -> orden global de alta
+        self.reservas: Dict[str, int] = {}    # user_id -> préstamos en curso
+
+    def añadir(self, libros: List[Tuple[Libro, int]]) -> bytes:
+        estados = bytearray()
+        for libro, orden in libros:
+            estado = self.biblioteca._añadir(libro)
+            if estado == ESTADO_OK:
+                self.orden[libro.isbn] = orden
+            estados.append(estado)
+        return bytes(estados)
+
+    def quitar(self, isbn: str) -> int:
+        estado = self.biblioteca._quitar(isbn)
+        if estado == ESTADO_OK:
+            del self.orden[isbn]
+        return estado
+
+    def registrar_usuarios(self, usuarios: List[Usuario]) -> bytes:
+        return bytes(map(self.biblioteca._registrar_usuario, usuarios))
+
+    def dar_baja(self, user_id: str) -> int:
+        if self.reservas.get(user_id):
+            return ESTADO_USUARIO_CON_PRESTAMOS
+        return self.biblioteca._dar_baja(user_id)
+
+    def reservar(self, user_ids: List[str]) -> List[str]:
+        """Reserva los usuarios registrados y devuelve cuáles lo están."""
+        registrados = [user_id for user_id in user_ids if user_id in self.biblioteca.user_ids]
+        for user_id in registrados:
+            self.reservas[user_id] = self.reservas.get(user_id, 0) + 1
+        return registrados
+
+    def aplicar_ejemplares(self, eventos: List[Tuple[str, str, str, bool]], ahora: float,
+                           con_detalle: bool = False):
+        """
+        Aplica en orden la parte de libro de eventos (tipo, isbn, user_id,
+        usuario_registrado), con las mismas validaciones que _prestar y _devolver.
+        Con con_detalle devuelve también, por evento, (libro, titular del
+        préstamo) tras aplicarlo, para los mensajes de prestar_libro y devolver_libro.
+        """
+        b = self.biblioteca
+        estados = bytearray()
+        detalles = [] if con_detalle else None
+        for tipo, isbn, user_id, registrado in eventos:
+            libro = b.libros.get(isbn)
+            if libro is None:
+                estado = ESTADO_LIBRO_NO_EXISTE
+            elif tipo == "prestar":
+                if not registrado:
+                    estado = ESTADO_USUARIO_NO_REGISTRADO
+                elif libro.is_borrowed:
+                    estado = ESTADO_YA_PRESTADO
+                else:
+                    b._prestar_ejemplar(libro, user_id, ahora, None)
+                    estado = ESTADO_OK
+            elif b.prestamos[isbn] != user_id:
+                estado = ESTADO_NO_PRESTADO_A_USUARIO
+            else:
+                b._devolver_ejemplar(libro)
+                estado = ESTADO_OK
+            estados.append(estado)
+            if detalles is not None:
+                detalles.append((libro, b.prestamos.get(isbn)))
+        return bytes(estados) if detalles is None else (bytes(estados), detalles)
+
+    def aplicar_usuarios(self, cambios: List[Tuple[str, str, str]], reservados: List[str]) -> None:
+        """Aplica en orden la parte de usuario de los eventos confirmados y libera las reservas."""
+        usuarios = self.biblioteca.usuarios
+        try:
+            for tipo, isbn, user_id in cambios:
+                if tipo == "prestar":
+                    usuarios[user_id].libros_prestados[isbn] = None
+                else:
+                    del usuarios[user_id].libros_prestados[isbn]
+        finally:
+            for user_id in reservados:
+                self.reservas[user_id] -= 1
+                if not self.reservas[user_id]:
+                    del self.reservas[user_id]
+
+    def buscar(self, titulo: Optional[str], autor: Optional[str],
+               categoria: Optional[str]) -> List[Tuple[int, Libro]]:
+        return [(self.orden[lib.isbn], lib) for lib in self.biblioteca.buscar(titulo, autor, categoria)]
+
+    def prestados(self, user_id: str) -> Optional[List[str]]:
+        usuario = self.biblioteca.usuarios.get(user_id)
+        return None if usuario is None else list(usuario.libros_prestados)
+
+    def libros(self, isbns: List[str]) -> List[Libro]:
+        return [self.biblioteca.libros[isbn] for isbn in isbns]
+
+    def vencidos(self, ahora: float) -> List[Tuple[str, str, float]]:
+        return self.biblioteca.vencidos(ahora)
+
+    def renovar(self, isbn: str, user_id: str, ahora: float) -> Tuple[int, Optional[float]]:
+        """Código ESTADO_* y, si se renovó, el nuevo vencimiento."""
+        b = self.biblioteca
+        estado = b._renovar(isbn, user_id, ahora)
+        return estado, b.vencimientos[isbn][1] if estado == ESTADO_OK else None
+
+    def avisar_vencidos(self, ahora: float) -> List[Tuple[str, str, float]]:
+        """Saca y devuelve los avisos pendientes hasta `ahora`, por vencimiento."""
+        avisos = []
+        self.biblioteca.avisar_vencidos(ahora, lambda *aviso: avisos.append(aviso))
+        return avisos
+
+    def proximo_aviso(self) -> Optional[float]:
+        return self.biblioteca.proximo_aviso()
+
+    def proximos_a_vencer(self, horizonte: float, ahora: float) -> List[Tuple[str, str, float]]:
+        return self.biblioteca.proximos_a_vencer(horizonte, ahora)
+
+    def tamaño(self) -> Tuple[int, int]:
+        return len(self.biblioteca.libros), len(self.biblioteca.usuarios)
+
+def _trabajador_fragmento(conexion, dias_prestamo: int) -> None:
+    """Bucle de un proceso fragmento: recibe (operación, argumentos) y responde (ok, resultado)."""
+    fragmento = _Fragmento(dias_prestamo)
+    while True:
+        mensaje = conexion.recv()
+        if mensaje is None:
+            break
+        operacion, argumentos = mensaje
+        try:
+            conexion.send((True, getattr(fragmento, operacion)(*argumentos)))
+        except Exception as e:
+            conexion.send((False, e))
+    conexion.close()
+
+class BibliotecaFragmentada:
+    """
+    Biblioteca repartida en procesos: los libros (con sus préstamos) se
+    reparten por crc32 del ISBN y los usuarios por crc32 del user_id. Expone
+    los mismos métodos públicos que Biblioteca salvo snapshot() (cada
+    fragmento está en otro proceso y no hay una versión común de todos); las
+    búsquedas y los avisos de vencimiento se piden a todos los fragmentos a
+    la vez y se combinan en orden.
+
+    Préstamos y devoluciones siguen tres fases, cada una en paralelo en los
+    fragmentos implicados:
+      1. los fragmentos de usuario reservan a los usuarios de los préstamos,
+      2. los fragmentos de libro aplican los eventos en orden y devuelven sus
+         códigos,
+      3. los fragmentos de usuario registran los eventos confirmados y
+         liberan las reservas.
+    Cada fragmento tiene un cerrojo para su tubería y otro para las
+    operaciones que cruzan fragmentos sobre sus libros; estos se toman en
+    orden de fragmento, así que dos lotes no pueden bloquearse entre sí.
+    Los libros que devuelve son copias. Los fragmentos viven en memoria.
+    """
+    def __init__(self, fragmentos: Optional[int] = None, dias_prestamo: int = 14, sumidero=None):
+        self.n = fragmentos or os.cpu_count() or 1
+        self.sumidero = sumidero if sumidero is not None else SumideroConsola()
+        self._conexiones = []
+        self._procesos = []
+        for _ in range(self.n):
+            propia, remota = multiprocessing.Pipe()
+            proceso = multiprocessing.Process(target=_trabajador_fragmento,
+                                              args=(remota, dias_prestamo), daemon=True)
+            proceso.start()
+            remota.close()
+            self._conexiones.append(propia)
+            self._procesos.append(proceso)
+        self._tubos = [threading.RLock() for _ in range(self.n)]
+        self._operaciones = [threading.Lock() for _ in range(self.n)]
+        self._orden = itertools.count()
+
+    def _fragmento(self, clave: str) -> int:
+        return zlib.crc32(clave.encode("utf-8")) % self.n
+
+    def _enviar(self, peticiones: Dict[int, Tuple[str, tuple]]) -> dict:
+        """Envía una petición a cada fragmento indicado y luego recoge todas las respuestas (ok, resultado)."""
+        fragmentos = sorted(peticiones)
+        for k in fragmentos:
+            self._tubos[k].acquire()
+        try:
+            for k in fragmentos:
+                self._conexiones[k].send(peticiones[k])
+            return {k: self._conexiones[k].recv() for k in fragmentos}
+        finally:
+            for k in fragmentos:
+                self._tubos[k].release()
+
+    def _dispersar(self, peticiones: Dict[int, Tuple[str, tuple]]) -> dict:
+        """Como _enviar, pero relanza el error del primer fragmento que haya fallado."""
+        respuestas = self._enviar(peticiones)
+        for ok, resultado in respuestas.values():
+            if not ok:
+                raise resultado
+        return {k: resultado for k, (ok, resultado) in respuestas.items()}
+
+    def _llamar(self, k: int, operacion: str, *argumentos):
+        return self._dispersar({k: (operacion, argumentos)})[k]
+
+    def _a_todos(self, operacion: str, *argumentos) -> list:
+        respuestas = self._dispersar({k: (operacion, argumentos) for k in range(self.n)})
+        return [respuestas[k] for k in range(self.n)]
+
+    def cerrar(self) -> None:
+        """Detiene los procesos fragmento."""
+        for k, conexion in enumerate(self._conexiones):
+            with self._tubos[k]:
+                conexion.send(None)
+        for proceso in self._procesos:
+            proceso.join()
+
+    # --- Gestión de libros y usuarios ---
+    def añadir_libros(self, libros: Iterable[Libro]) -> int:
+        """Alta en bloque sin mensajes; devuelve cuántos libros se añadieron."""
+        libros = [(libro, self._fragmento(libro.isbn)) for libro in libros]
+        fragmentos = sorted({k for _, k in libros})
+        for k in fragmentos:
+            self._tubos[k].acquire()
+        try:
+            # el orden global sigue el de la entrada, como en Biblioteca, y se
+            # asigna con las tuberías tomadas para que cada fragmento reciba
+            # sus libros en orden creciente
+            por_fragmento: Dict[int, list] = {k: [] for k in fragmentos}
+            for libro, k in libros:
+                por_fragmento[k].append((libro, next(self._orden)))
+            respuestas = self._dispersar({k: ("añadir", (lista,)) for k, lista in por_fragmento.items()})
+        finally:
+            for k in fragmentos:
+                self._tubos[k].release()
+        return sum(estados.count(ESTADO_OK) for estados in respuestas.values())
+
+    def añadir_libro(self, libro: Libro) -> bool:
+        """Añade un libro al catálogo. Devuelve True si se añadió, False si ya existía ISBN."""
+        k = self._fragmento(libro.isbn)
+        with self._tubos[k]:
+            estado = self._llamar(k, "añadir", [(libro, next(self._orden))])[0]
+        if estado == ESTADO_YA_EXISTE:
+            _emitir(self.sumidero, "Añadir libro", ESTADO_YA_EXISTE,
+                    "ISBN {isbn} ya existe en la biblioteca.", isbn=libro.isbn)
+            return False
+        _emitir(self.sumidero, "Añadir libro", ESTADO_OK, "Libro añadido: {libro}", libro=libro)
+        return True
+
+    def quitar_libro(self, isbn: str) -> bool:
+        """Quita un libro del catálogo si existe y no está prestado."""
+        k = self._fragmento(isbn)
+        with self._operaciones[k]:
+            estado = self._llamar(k, "quitar", isbn)
+        if estado == ESTADO_LIBRO_NO_EXISTE:
+            _emitir(self.sumidero, "Quitar libro", ESTADO_LIBRO_NO_EXISTE, "ISBN {isbn} no encontrado.", isbn=isbn)
+        elif estado == ESTADO_YA_PRESTADO:
+            _emitir(self.sumidero, "Quitar libro", ESTADO_YA_PRESTADO,
+                    "ISBN {isbn} está actualmente prestado; no puede eliminarse.", isbn=isbn)
+        else:
+            _emitir(self.sumidero, "Quitar libro", ESTADO_OK,
+                    "Libro con ISBN {isbn} eliminado del catálogo.", isbn=isbn)
+        return estado == ESTADO_OK
+
+    def registrar_usuarios(self, usuarios: Iterable[Usuario]) -> int:
+        """Registro en bloque sin mensajes; devuelve cuántos usuarios se registraron."""
+        por_fragmento: Dict[int, list] = {}
+        for usuario in usuarios:
+            por_fragmento.setdefault(self._fragmento(usuario.user_id), []).append(usuario)
+        respuestas = self._dispersar({k: ("registrar_usuarios", (lista,)) for k, lista in por_fragmento.items()})
+        return sum(estados.count(ESTADO_OK) for estados in respuestas.values())
+
+    def registrar_usuario(self, usuario: Usuario) -> bool:
+        """Registra un usuario si su ID es único."""
+        estado = self._llamar(self._fragmento(usuario.user_id), "registrar_usuarios", [usuario])[0]
+        if estado == ESTADO_YA_EXISTE:
+            _emitir(self.sumidero, "Registrar usuario", ESTADO_YA_EXISTE,
+                    "ID {user_id} ya registrado.", user_id=usuario.user_id)
+            return False
+        _emitir(self.sumidero, "Registrar usuario", ESTADO_OK, "Usuario registrado: {usuario}", usuario=usuario)
+        return True
+
+    def dar_baja_usuario(self, user_id: str) -> bool:
+        """Da de baja a un usuario solo si no tiene libros prestados."""
+        estado = self._llamar(self._fragmento(user_id), "dar_baja", user_id)
+        if estado == ESTADO_USUARIO_NO_REGISTRADO:
+            _emitir(self.sumidero, "Dar de baja", ESTADO_USUARIO_NO_REGISTRADO,
+                    "Usuario {user_id} no existe.", user_id=user_id)
+        elif estado == ESTADO_USUARIO_CON_PRESTAMOS:
+            _emitir(self.sumidero, "Dar de baja", ESTADO_USUARIO_CON_PRESTAMOS,
+                    "Usuario {user_id} tiene libros prestados; no puede darse de baja.", user_id=user_id)
+        else:
+            _emitir(self.sumidero, "Dar de baja", ESTADO_OK,
+                    "Usuario {user_id} ha sido dado de baja.", user_id=user_id)
+        return estado == ESTADO_OK
+
+    # --- Préstamos ---
+    def procesar_eventos(self, eventos: Iterable[Tuple[str, str, str]]) -> bytearray:
+        """
+        Aplica en bloque eventos (tipo, isbn, user_id) con el mismo resultado
+        que Biblioteca.procesar_eventos; devuelve un código ESTADO_* por evento.
+        Si un fragmento falla, los eventos de los demás se confirman igualmente,
+        se liberan todas las reservas y se relanza el error; los del
+        fragmento que falló pueden haber quedado aplicados solo en parte.
+        """
+        return self._procesar_eventos(eventos)
+
+    def _procesar_eventos(self, eventos: Iterable[Tuple[str, str, str]],
+                          detalles: Optional[list] = None) -> bytearray:
+        """procesar_eventos; si se da `detalles`, guarda en él (libro, titular) de cada evento."""
+        eventos = list(eventos)
+        estados = bytearray(len(eventos))
+        validos = []                                 # (índice, tipo, isbn, user_id, fragmento del libro)
+        usuarios: Dict[int, Dict[str, None]] = {}    # fragmento -> usuarios de préstamos
+        for i, evento in enumerate(eventos):
+            try:
+                tipo, isbn, user_id = evento
+                if tipo != "prestar" and tipo != "devolver":
+                    raise ValueError(tipo)
+                k_libro = self._fragmento(isbn)
+                k_usuario = self._fragmento(user_id)
+            except (AttributeError, TypeError, ValueError):
+                estados[i] = ESTADO_EVENTO_INVALIDO
+                continue
+            validos.append((i, tipo, isbn, user_id, k_libro))
+            if tipo == "prestar":
+                usuarios.setdefault(k_usuario, {})[user_id] = None
+        fragmentos_libro = sorted({v[4] for v in validos})
+        for k in fragmentos_libro:
+            self._operaciones[k].acquire()
+        try:
+            # 1. reservar usuarios
+            respuestas = self._enviar({k: ("reservar", (list(ids),)) for k, ids in usuarios.items()})
+            reservados = {k: ids for k, (ok, ids) in respuestas.items() if ok}
+            errores = [e for ok, e in respuestas.values() if not ok]
+            cambios: Dict[int, list] = {k: [] for k in reservados}
+            if not errores:
+                # 2. parte de libro
+                registrados = set().union(*reservados.values())
+                por_libro: Dict[int, list] = {}
+                for i, tipo, isbn, user_id, k in validos:
+                    por_libro.setdefault(k, []).append((tipo, isbn, user_id, user_id in registrados))
+                ahora = time.time()
+                con_detalle = detalles is not None
+                respuestas = self._enviar({k: ("aplicar_ejemplares", (lista, ahora, con_detalle))
+                                           for k, lista in por_libro.items()})
+                errores = [e for ok, e in respuestas.values() if not ok]
+                cursores = {k: zip(*(r if con_detalle else (r, itertools.repeat(None))))
+                            for k, (ok, r) in respuestas.items() if ok}
+                # 3. parte de usuario, en el orden original; la de un fragmento que falló no se confirma
+                for i, tipo, isbn, user_id, k in validos:
+                    if k not in cursores:
+                        continue
+                    estados[i], detalle = next(cursores[k])
+                    if con_detalle:
+                        detalles[i] = detalle
+                    if estados[i] == ESTADO_OK:
+                        cambios.setdefault(self._fragmento(user_id), []).append((tipo, isbn, user_id))
+            # también si algo falló: aplicar_usuarios es lo que libera las reservas
+            self._dispersar({k: ("aplicar_usuarios", (lista, reservados.get(k, [])))
+                             for k, lista in cambios.items()})
+            if errores:
+                raise errores[0]
+        finally:
+            for k in fragmentos_libro:
+                self._operaciones[k].release()
+        return estados
+
+    def prestar_libro(self, isbn: str, user_id: str) -> bool:
+        """Presta un libro a un usuario si está disponible y ambos existen."""
+        detalles = [None]
+        estado = self._procesar_eventos([("prestar", isbn, user_id)], detalles)[0]
+        libro, propietario = detalles[0] or (None, None)
+        if estado == ESTADO_LIBRO_NO_EXISTE:
+            _emitir(self.sumidero, "Prestar", ESTADO_LIBRO_NO_EXISTE, "ISBN {isbn} no existe.", isbn=isbn)
+        elif estado == ESTADO_USUARIO_NO_REGISTRADO:
+            _emitir(self.sumidero, "Prestar", ESTADO_USUARIO_NO_REGISTRADO,
+                    "Usuario {user_id} no registrado.", user_id=user_id)
+        elif estado == ESTADO_YA_PRESTADO:
+            _emitir(self.sumidero, "Prestar", ESTADO_YA_PRESTADO,
+                    "Libro {isbn} ya está prestado a {propietario}.", isbn=isbn, propietario=propietario)
+        else:
+            _emitir(self.sumidero, "Prestar", ESTADO_OK,
+                    "Libro {libro.titulo!r} (ISBN {isbn}) prestado a usuario {user_id}.",
+                    libro=libro, isbn=isbn, user_id=user_id)
+        return estado == ESTADO_OK
+
+    def devolver_libro(self, isbn: str, user_id: str) -> bool:
+        """Devuelve un libro: solo si está prestado a ese usuario."""
+        detalles = [None]
+        estado = self._procesar_eventos([("devolver", isbn, user_id)], detalles)[0]
+        _, propietario = detalles[0] or (None, None)
+        if estado == ESTADO_LIBRO_NO_EXISTE:
+            _emitir(self.sumidero, "Devolver", ESTADO_LIBRO_NO_EXISTE,
+                    "ISBN {isbn} no existe en el catálogo.", isbn=isbn)
+        elif estado == ESTADO_NO_PRESTADO_A_USUARIO:
+            _emitir(self.sumidero, "Devolver", ESTADO_NO_PRESTADO_A_USUARIO,
+                    "Libro {isbn} no está prestado a {user_id} (actual: {propietario}).",
+                    isbn=isbn, user_id=user_id, propietario=propietario)
+        else:
+            _emitir(self.sumidero, "Devolver", ESTADO_OK,
+                    "Libro ISBN {isbn} devuelto por usuario {user_id}.", isbn=isbn, user_id=user_id)
+        return estado == ESTADO_OK
+
+    def vencidos(self, ahora: Optional[float] = None) -> List[Tuple[str, str, float]]:
+        """Préstamos vencidos de todos los fragmentos, del más antiguo al más reciente."""
+        ahora = time.time() if ahora is None else ahora
+        return list(heapq.merge(*self._a_todos("vencidos", ahora), key=itemgetter(2)))
+
+    def proximos_a_vencer(self, horizonte: float, ahora: Optional[float] = None) -> List[Tuple[str, str, float]]:
+        ahora = time.time() if ahora is None else ahora
+        return list(heapq.merge(*self._a_todos("proximos_a_vencer", horizonte, ahora), key=itemgetter(2)))
+
+    def renovar(self, isbn: str, user_id: str, ahora: Optional[float] = None) -> bool:
+        """Renueva un préstamo en el fragmento del libro, como Biblioteca.renovar."""
+        ahora = time.time() if ahora is None else ahora
+        k = self._fragmento(isbn)
+        with self._operaciones[k]:
+            estado, vence = self._llamar(k, "renovar", isbn, user_id, ahora)
+        if estado == ESTADO_LIBRO_NO_EXISTE:
+            _emitir(self.sumidero, "Renovar", ESTADO_LIBRO_NO_EXISTE,
+                    "ISBN {isbn} no existe en el catálogo.", isbn=isbn)
+        elif estado == ESTADO_NO_PRESTADO_A_USUARIO:
+            _emitir(self.sumidero, "Renovar", ESTADO_NO_PRESTADO_A_USUARIO,
+                    "Libro {isbn} no está prestado a {user_id}.", isbn=isbn, user_id=user_id)
+        else:
+            _emitir(self.sumidero, "Renovar", ESTADO_OK,
+                    "Préstamo de ISBN {isbn} renovado hasta {vence}.", isbn=isbn, vence=_Fecha(vence))
+        return estado == ESTADO_OK
+
+    def proximo_aviso(self) -> Optional[float]:
+        """El próximo vencimiento sin avisar de todos los fragmentos."""
+        pendientes = [aviso for aviso in self._a_todos("proximo_aviso") if aviso is not None]
+        return min(pendientes) if pendientes else None
+
+    def avisar_vencidos(self, ahora: Optional[float] = None, avisar=None) -> int:
+        """
+        Como Biblioteca.avisar_vencidos: cada fragmento entrega sus avisos
+        pendientes y se emiten juntos por orden de vencimiento.
+        """
+        ahora = time.time() if ahora is None else ahora
+        avisos = list(heapq.merge(*self._a_todos("avisar_vencidos", ahora), key=itemgetter(2)))
+        for isbn, user_id, vence in avisos:
+            if avisar is None:
+                _emitir(self.sumidero, "Aviso", ESTADO_OK,
+                        "Libro ISBN {isbn} prestado a {user_id} venció el {vence}.",
+                        isbn=isbn, user_id=user_id, vence=_Fecha(vence))
+            else:
+                avisar(isbn, user_id, vence)
+        return len(avisos)
+
+    # --- Búsquedas ---
+    def buscar(self, titulo: Optional[str] = None, autor: Optional[str] = None,
+               categoria: Optional[str] = None) -> List[Libro]:
+        """Como Biblioteca.buscar: consulta todos los fragmentos a la vez y combina en orden de alta."""
+        parciales = self._a_todos("buscar", titulo, autor, categoria)
+        return [libro for _, libro in heapq.merge(*parciales, key=itemgetter(0))]
+
+    def buscar_por_titulo(self, texto: str) -> List[Libro]:
+        resultados = self.buscar(titulo=texto)
+        _emitir(self.sumidero, "Buscar título", ESTADO_OK,
+                "Encontrados {n} resultados para '{texto}'.", n=len(resultados), texto=texto)
+        return resultados
+
+    def buscar_por_autor(self, autor: str) -> List[Libro]:
+        resultados = self.buscar(autor=autor)
+        _emitir(self.sumidero, "Buscar autor", ESTADO_OK,
+                "Encontrados {n} resultados para '{texto}'.", n=len(resultados), texto=autor)
+        return resultados
+
+    def buscar_por_categoria(self, categoria: str) -> List[Libro]:
+        resultados = self.buscar(categoria=categoria)
+        _emitir(self.sumidero, "Buscar categoría", ESTADO_OK,
+                "Encontrados {n} resultados para '{texto}'.", n=len(resultados), texto=categoria)
+        return resultados
+
+    # --- Listados ---
+    def listar_prestados_usuario(self, user_id: str) -> List[Libro]:
+        """Devuelve los objetos Libro prestados a un usuario."""
+        isbns = self._llamar(self._fragmento(user_id), "prestados", user_id)
+        if isbns is None:
+            _emitir(self.sumidero, "Listar prestados", ESTADO_USUARIO_NO_REGISTRADO,
+                    "Usuario {user_id} no existe.", user_id=user_id)
+            return []
+        por_fragmento: Dict[int, list] = {}
+        for isbn in isbns:
+            por_fragmento.setdefault(self._fragmento(isbn), []).append(isbn)
+        respuestas = self._dispersar({k: ("libros", (lista,)) for k, lista in por_fragmento.items()})
+        libros = {libro.isbn: libro for lista in respuestas.values() for libro in lista}
+        resultados = [libros[isbn] for isbn in isbns]
+        _emitir(self.sumidero, "Listar prestados", ESTADO_OK,
+                "Usuario {user_id} tiene {n} libros prestados.", user_id=user_id, n=len(resultados))
+        return resultados
+
+# --------------------------
+# Benchmarks
+# --------------------------
+def benchmark_fragmentos(n_libros: int = 200_000, n_usuarios: int = 20_000, n_eventos: int = 1_000_000,
+                         n_busquedas: int = 200) -> None:
+    """Eventos de préstamo por segundo y búsquedas por segundo con 1, 2, 4... fragmentos."""
+    aleatorio = random.Random(0)
+    libros = [Libro((f"Autor {i % 5000}", f"Título {i}"), f"Categoría {i % 40}", str(i)) for i in range(n_libros)]
+    usuarios = [Usuario(f"Usuario {u}", f"u{u}") for u in range(n_usuarios)]
+    eventos = [(aleatorio.choice(("prestar", "prestar", "devolver")), str(aleatorio.randrange(n_libros)),
+                f"u{aleatorio.randrange(n_usuarios)}") for _ in range(n_eventos)]
+    consultas = [f"autor {aleatorio.randrange(5000)}" for _ in range(n_busquedas)]
+    for fragmentos in sorted({1, 2, 4, os.cpu_count() or 1}):
+        biblioteca = BibliotecaFragmentada(fragmentos)
+        biblioteca.añadir_libros(libros)
+        biblioteca.registrar_usuarios(usuarios)
+        inicio = time.perf_counter()
+        biblioteca.procesar_eventos(eventos)
+        t_eventos = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        for consulta in consultas:
+            biblioteca.buscar(autor=consulta)
+        t_busquedas = time.perf_counter() - inicio
+        biblioteca.cerrar()
+        print(f"[BENCH] {fragmentos:>2} fragmentos: {n_eventos / t_eventos:12,.0f} eventos/s, "
+              f"{n_busquedas / t_busquedas:8,.1f} búsquedas/s")
+
+@dataclass
+class _LibroConDict:
+    """Disposición anterior de Libro (con __dict__ y sin internar), solo para comparar."""
+    meta: Tuple[str, str]
+    categoria: str
+    isbn: str
+    is_borrowed: bool = False
+
+def benchmark_memoria(tamaños: Tuple[int, ...] = (1_000_000, 5_000_000)) -> None:
+    """Bytes por libro del catálogo: dataclass con __dict__, Libro con slots e internado, y CatalogoCompacto."""
+    casos = (("con __dict__", _LibroConDict, dict),
+             ("slots + internado", Libro, dict),
+             ("CatalogoCompacto", Libro, CatalogoCompacto))
+    for n in tamaños:
+        for nombre, clase, almacen in casos:
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            libros = almacen()
+            for i in range(n):
+                isbn = str(9780000000000 + i)
+                libros[isbn] = clase((f"Autor {i % 20000}", f"Título del libro {i}"), f"Categoría {i % 200}", isbn)
+            t = time.perf_counter() - inicio
+            memoria, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"[BENCH] {n:>9,} libros, {nombre:>17}: {memoria / n:6.1f} bytes/libro, {n / t:,.0f} libros/s")
+            del libros
+
+CATEGORIAS = ("Novela", "Poesía", "Ensayo", "Cuento", "Teatro", "Historia", "Ciencia", "Filosofía",
+              "Biografía", "Infantil", "Juvenil", "Cómic", "Viajes", "Cocina", "Arte", "Música",
+              "Derecho", "Economía", "Medicina", "Informática")
+SILABAS = ("ma", "ri", "so", "la", "ne", "to", "ca", "mi", "lu", "da", "pe", "ro", "sa", "ti", "vo",
+           "gra", "bre", "cle", "fru", "pla", "tin", "mar", "sol", "ven", "cor")
+
+def generar_datos(n_libros: int, semilla: int = 0) -> Tuple[List[Libro], List[Usuario], List[str]]:
+    """
+    Catálogo sintético reproducible: n_libros libros (títulos de tres palabras
+    de un vocabulario de 2000, autores con popularidad sesgada y 20
+    categorías), n_libros // 10 usuarios y el vocabulario usado.
+    """
+    aleatorio = random.Random(semilla)
+    vocabulario = sorted({"".join(aleatorio.choices(SILABAS, k=aleatorio.randint(2, 4))) for _ in range(2600)})[:2000]
+    n_autores = max(100, n_libros // 50)
+    autores = [f"{aleatorio.choice(vocabulario).capitalize()} {aleatorio.choice(vocabulario).capitalize()}ez"
+               for _ in range(n_autores)]
+    libros = [Libro((autores[int(aleatorio.paretovariate(1.2)) % n_autores],
+                     " ".join(aleatorio.choices(vocabulario, k=3)).capitalize()),
+                    aleatorio.choice(CATEGORIAS), str(9780000000000 + i))
+              for i in range(n_libros)]
+    usuarios = [Usuario(f"Usuario {u}", f"u{u}") for u in range(max(100, n_libros // 10))]
+    return libros, usuarios, vocabulario
+
+def generar_traza(libros: List[Libro], usuarios: List[Usuario], n_eventos: int,
+                  semilla: int = 0) -> List[Tuple[str, str, str]]:
+    """Traza de préstamos: préstamos al azar y devoluciones de préstamos anteriores (45 %)."""
+    aleatorio = random.Random(semilla)
+    traza = []
+    abiertos = []
+    for _ in range(n_eventos):
+        if abiertos and aleatorio.random() < 0.45:
+            j = aleatorio.randrange(len(abiertos))
+            abiertos[j], abiertos[-1] = abiertos[-1], abiertos[j]
+            traza.append(("devolver", *abiertos.pop()))
+        else:
+            prestamo = (aleatorio.choice(libros).isbn, aleatorio.choice(usuarios).user_id)
+            abiertos.append(prestamo)
+            traza.append(("prestar", *prestamo))
+    return traza
+
+def _rss_maximo_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # macOS lo da en bytes
+
+def _medir(operacion: str, n: int, llamadas: list, perfil: Optional[str], salida: str) -> dict:
+    """
+    Ejecuta las llamadas (sin argumentos) midiendo cada una y devuelve el
+    registro de resultados: ops/s, latencias p50/p99, RSS máximo y, si se
+    pide, el perfil de cProfile (archivo .prof) o las asignaciones de tracemalloc.
+    """
+    latencias = []
+    perfilador = cProfile.Profile() if perfil == "cprofile" else None
+    if perfil == "tracemalloc":
+        tracemalloc.start()
+    if perfilador is not None:
+        perfilador.enable()
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        inicio = time.perf_counter()
+        for llamada in llamadas:
+            t0 = time.perf_counter()
+            llamada()
+            latencias.append(time.perf_counter() - t0)
+        total = time.perf_counter() - inicio
+    registro = {"tamaño": n, "operacion": operacion, "ops": len(latencias),
+                "ops_s": len(latencias) / total if total else None}
+    latencias.sort()
+    registro["p50_us"] = latencias[len(latencias) // 2] * 1e6 if latencias else None
+    registro["p99_us"] = latencias[int(0.99 * (len(latencias) - 1))] * 1e6 if latencias else None
+    if perfilador is not None:
+        perfilador.disable()
+        ruta = f"{salida}.{operacion}.{n}.prof"
+        perfilador.dump_stats(ruta)
+        registro["perfil"] = ruta
+    elif perfil == "tracemalloc":
+        instantanea = tracemalloc.take_snapshot()
+        registro["memoria_pico_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        registro["asignaciones"] = [str(estadistica) for estadistica in instantanea.statistics("lineno")[:5]]
+        tracemalloc.stop()
+    registro["rss_max_kb"] = _rss_maximo_kb()
+    return registro
+
+def benchmark_operaciones(tamaños: Tuple[int, ...] = (10_000, 100_000, 1_000_000, 5_000_000),
+                          salida: str = "benchmark_biblioteca.json", perfil: Optional[str] = None,
+                          operaciones: int = 20_000, consultas: int = 200, compacto: bool = False,
+                          semilla: int = 0) -> List[dict]:
+    """
+    Suite de operaciones públicas de Biblioteca sobre catálogos sintéticos
+    de cada tamaño: añadir, prestar, listar prestados, devolver, buscar por
+    título/autor/categoría y procesar_eventos (lotes de 1000). Informa de
+    ops/s, latencia p50/p99 y RSS máximo tras cada operación, y guarda los
+    resultados en `salida` (JSON) para comparar ejecuciones.
+    perfil="cprofile" o "tracemalloc" activa la captura correspondiente.
+    """
+    ejecucion = {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "plataforma": platform.platform(), "compacto": compacto, "perfil": perfil,
+                 "resultados": []}
+    for n in tamaños:
+        aleatorio = random.Random(semilla)
+        libros, usuarios, vocabulario = generar_datos(n, semilla)
+        extra, _, _ = generar_datos(operaciones, semilla + 1)
+        for libro in extra:
+            libro.isbn = "X" + libro.isbn
+        biblioteca = Biblioteca(compacto=compacto)
+        inicio = time.perf_counter()
+        for libro in libros:
+            biblioteca._añadir(libro)
+        for usuario in usuarios:
+            biblioteca._registrar_usuario(usuario)
+        carga = time.perf_counter() - inicio
+        ejecucion["resultados"].append({"tamaño": n, "operacion": "carga", "ops": n + len(usuarios),
+                                        "ops_s": (n + len(usuarios)) / carga, "p50_us": None,
+                                        "p99_us": None, "rss_max_kb": _rss_maximo_kb()})
+        prestamos = [(libro.isbn, aleatorio.choice(usuarios).user_id)
+                     for libro in aleatorio.sample(libros, min(operaciones, n))]
+        devoluciones = aleatorio.sample(prestamos, len(prestamos))
+        autores = list({libro.autor.split()[-1] for libro in aleatorio.sample(libros, min(consultas, n))})
+        traza = generar_traza(libros, usuarios, 100 * 1000, semilla)
+        fases = (
+            ("añadir_libro", [functools.partial(biblioteca.añadir_libro, libro) for libro in extra]),
+            ("prestar_libro", [functools.partial(biblioteca.prestar_libro, *p) for p in prestamos]),
+            ("listar_prestados_usuario", [functools.partial(biblioteca.listar_prestados_usuario,
+                                                            aleatorio.choice(usuarios).user_id)
+                                          for _ in range(operaciones)]),
+            ("devolver_libro", [functools.partial(biblioteca.devolver_libro, *p) for p in devoluciones]),
+            ("buscar_por_titulo", [functools.partial(biblioteca.buscar_por_titulo, aleatorio.choice(vocabulario))
+                                   for _ in range(consultas)]),
+            ("buscar_por_autor", [functools.partial(biblioteca.buscar_por_autor, aleatorio.choice(autores))
+                                  for _ in range(consultas)]),
+            ("buscar_por_categoria", [functools.partial(biblioteca.buscar_por_categoria,
+                                                        aleatorio.choice(CATEGORIAS))
+                                      for _ in range(consultas)]),
+            ("procesar_eventos_1000", [functools.partial(biblioteca.procesar_eventos, traza[i:i + 1000])
+                                       for i in range(0, len(traza), 1000)]),
+        )
+        for operacion, llamadas in fases:
+            registro = _medir(operacion, n, llamadas, perfil, salida)
+            ejecucion["resultados"].append(registro)
+            rss = registro["rss_max_kb"]
+            print(f"[BENCH] {n:>9,} libros {operacion:<25} {registro['ops_s']:12,.0f} ops/s  "
+                  f"p50 {registro['p50_us']:9.1f} µs  p99 {registro['p99_us']:9.1f} µs  "
+                  f"RSS máx {'-' if rss is None else f'{rss / 1024:,.0f} MB'}")
+        del biblioteca, libros, usuarios, extra, fases
+        # se reescribe tras cada tamaño para no perder resultados si una ejecución larga se corta
+        with open(salida, "w", encoding="utf-8") as f:
+            json.dump(ejecucion, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {salida}.")
+    return ejecucion["resultados"]
+
+def benchmark_snapshots(n_libros: int = 100_000, lectores: Tuple[int, ...] = (1, 4),
+                        duracion: float = 3.0) -> None:
+    """
+    Hilos lectores que listan los préstamos de usuarios al azar y comprueban
+    que cada libro listado figura prestado a ese usuario, mientras un hilo
+    escritor presta y devuelve sin parar. Compara leer el estado vivo con
+    leer en snapshot(): lecturas/s, escrituras/s e incoherencias vistas.
+    """
+    libros, usuarios, _ = generar_datos(n_libros)
+    traza = generar_traza(libros, usuarios, 200_000)
+    print(f"[BENCH] {n_libros:,} libros, {len(usuarios):,} usuarios, {duracion:.0f} s por prueba")
+    for modo in ("vivo", "snapshot"):
+        for n_lectores in lectores:
+            biblioteca = Biblioteca()
+            for libro in libros:
+                biblioteca._añadir(Libro(libro.meta, libro.categoria, libro.isbn))
+            for usuario in usuarios:
+                biblioteca._registrar_usuario(Usuario(usuario.nombre, usuario.user_id))
+            if modo == "snapshot":
+                with biblioteca.snapshot():
+                    pass  # activa la copia versionada antes de medir
+            fin = time.perf_counter() + duracion
+            lecturas = [0] * n_lectores
+            incoherencias = [0] * n_lectores
+            escrituras = [0]
+
+            def escritor():
+                acciones = {"prestar": biblioteca._prestar, "devolver": biblioteca._devolver}
+                for tipo, isbn, user_id in itertools.cycle(traza):
+                    if time.perf_counter() >= fin:
+                        return
+                    with biblioteca._cerrojo:
+                        acciones[tipo](isbn, user_id)
+                    escrituras[0] += 1
+
+            def lector(k: int):
+                aleatorio = random.Random(k)
+                while time.perf_counter() < fin:
+                    user_id = aleatorio.choice(usuarios).user_id
+                    if modo == "snapshot":
+                        with biblioteca.snapshot() as s:
+                            prestados = [(l.isbn, s.prestamos[l.isbn]) for l in s.listar_prestados_usuario(user_id)]
+                    else:
+                        prestados = [(isbn, biblioteca.prestamos.get(isbn))
+                                     for isbn in list(biblioteca.usuarios[user_id].libros_prestados)]
+                    incoherencias[k] += sum(propietario != user_id for _, propietario in prestados)
+                    lecturas[k] += 1
+
+            hilos = [threading.Thread(target=escritor)] + [threading.Thread(target=lector, args=(k,))
+                                                            for k in range(n_lectores)]
+            for h in hilos:
+                h.start()
+            for h in hilos:
+                h.join()
+            print(f"[BENCH] {modo:<8} {n_lectores} lector(es): {sum(lecturas) / duracion:10,.0f} lecturas/s  "
+                  f"{escrituras[0] / duracion:10,.0f} escrituras/s  incoherencias {sum(incoherencias)}")
+
+def benchmark_sumideros(n_eventos: int = 200_000) -> None:
+    """
+    prestar_libro/devolver_libro de una traza con cada sumidero: la consola
+    (redirigida a os.devnull), el nulo y el JSONL en un archivo temporal.
+    """
+    libros, usuarios, _ = generar_datos(max(1000, n_eventos // 10))
+    traza = generar_traza(libros, usuarios, n_eventos)
+    directorio = tempfile.mkdtemp(prefix="benchmark_sumideros_")
+    ruta = os.path.join(directorio, "eventos.jsonl")
+    sumideros = (("consola", SumideroConsola), ("nulo", SumideroNulo),
+                 ("jsonl", lambda: SumideroJSONL(ruta)))
+    try:
+        for nombre, crear in sumideros:
+            sumidero = crear()
+            biblioteca = Biblioteca(sumidero=sumidero)
+            for libro in libros:
+                biblioteca._añadir(Libro(libro.meta, libro.categoria, libro.isbn))
+            for usuario in usuarios:
+                biblioteca._registrar_usuario(Usuario(usuario.nombre, usuario.user_id))
+            acciones = {"prestar": biblioteca.prestar_libro, "devolver": biblioteca.devolver_libro}
+            try:
+                with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+                    inicio = time.perf_counter()
+                    for tipo, isbn, user_id in traza:
+                        acciones[tipo](isbn, user_id)
+                    sumidero.cerrar()  # incluye escribir lo pendiente
+                    t = time.perf_counter() - inicio
+            finally:
+                sumidero.cerrar()
+            print(f"[BENCH] sumidero {nombre:<8}: {n_eventos / t:12,.0f} operaciones/s")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+BENCHMARKS = {"fragmentos": benchmark_fragmentos, "memoria": benchmark_memoria,
+              "operaciones": benchmark_operaciones, "snapshots": benchmark_snapshots,
+              "sumideros": benchmark_sumideros}
+
+def _main_benchmark(argumentos: List[str]) -> None:
+    analizador = argparse.ArgumentParser(prog="--benchmark", description="Benchmarks de la biblioteca digital.")
+    analizador.add_argument("nombre", choices=sorted(BENCHMARKS))
+    opcionales = [
+        analizador.add_argument("--tamanos", dest="tamaños", type=lambda t: tuple(int(x) for x in t.split(",")),
+                                help="tamaños separados por comas, p. ej. 10000,100000"),
+        analizador.add_argument("--salida", help="archivo JSON de resultados (operaciones)"),
+        analizador.add_argument("--perfil", choices=("cprofile", "tracemalloc"), help="captura opcional (operaciones)"),
+        analizador.add_argument("--compacto", action="store_true", default=None,
+                                help="usar CatalogoCompacto (operaciones)"),
+    ]
+    args = analizador.parse_args(argumentos)
+    opciones = {clave: valor for clave, valor in vars(args).items() if clave != "nombre" and valor is not None}
+    benchmark = BENCHMARKS[args.nombre]
+    # se comprueba antes de llamar: un TypeError dentro del benchmark es un fallo, no una opción
+    admitidas = inspect.signature(benchmark).parameters
+    sobrantes = [accion.option_strings[0] for accion in opcionales
+                 if accion.dest in opciones and accion.dest not in admitidas]
+    if sobrantes:
+        analizador.error(f"opción no admitida por '{args.nombre}': {', '.join(sobrantes)}")
+    benchmark(**opciones)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--benchmark":
+        _main_benchmark(sys.argv[2:])
@@ -0,0 +1,151 @@
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+RUTA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    "Sistema de Gestión de Biblioteca Digital.py")
+_spec = importlib.util.spec_from_file_location("biblioteca_digital", RUTA)
+bd = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = bd  # los fragmentos reciben Libro por pickle
+_spec.loader.exec_module(bd)
+
+
+def _libro(isbn, titulo, autor="Autor", categoria="Novela"):
+    return bd.Libro((autor, titulo), categoria, isbn)
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.biblioteca = bd.Biblioteca(sumidero=bd.SumideroNulo())
+        with self.biblioteca.snapshot():  # a partir de aquí se mantienen las versiones
+            pass
+
+    def isbns(self, origen, **criterios):
+        return [libro.isbn for libro in origen.buscar(**criterios)]
+
+    def test_libro_dado_de_alta_otra_vez_entre_publicaciones(self):
+        b = self.biblioteca
+        b.añadir_libro(_libro("1", "Rayuela"))
+        b.quitar_libro("1")
+        b.añadir_libro(_libro("1", "Rayuela"))
+        with b.snapshot() as s:
+            self.assertIn("1", s.libros)
+            self.assertEqual(self.isbns(s, titulo="rayu"), self.isbns(b, titulo="rayu"))
+            self.assertEqual(self.isbns(s, titulo="rayu"), ["1"])
+
+    def test_alta_otra_vez_no_cambia_una_version_anterior(self):
+        b = self.biblioteca
+        b.añadir_libro(_libro("1", "Rayuela"))
+        with b.snapshot() as antes:
+            b.quitar_libro("1")
+            with b.snapshot() as sin_libro:
+                b.añadir_libro(_libro("1", "Rayuela"))
+                with b.snapshot() as despues:
+                    self.assertEqual(self.isbns(antes, titulo="rayu"), ["1"])
+                    self.assertEqual(self.isbns(sin_libro, titulo="rayu"), [])
+                    self.assertNotIn("1", sin_libro.libros)
+                    self.assertEqual(self.isbns(despues, titulo="rayu"), ["1"])
+
+    def test_snapshot_coincide_con_la_biblioteca_tras_altas_y_bajas(self):
+        # muchas bajas seguidas fuerzan la compactación de las listas
+        b = self.biblioteca
+        azar = random.Random(3)
+        for paso in range(3000):
+            isbn = str(azar.randrange(40))
+            if isbn in b.libros:
+                b.quitar_libro(isbn)
+            else:
+                b.añadir_libro(_libro(isbn, f"Rayuela {isbn}"))
+            if paso % 97 == 0:
+                with b.snapshot() as s:
+                    self.assertEqual(self.isbns(s, titulo="rayuela"), self.isbns(b, titulo="rayuela"))
+                    self.assertEqual(sorted(s.libros), sorted(b.libros))
+
+
+class TestPersistencia(unittest.TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = os.path.join(directorio.name, "biblioteca.json")
+
+    def test_instantanea_de_otra_version_del_formato(self):
+        b = bd.Biblioteca(ruta=self.ruta, sumidero=bd.SumideroNulo())
+        b.añadir_libro(_libro("1", "Rayuela"))
+        b.compactar()
+        b.cerrar()
+        with open(self.ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        datos["version"] = bd.VERSION_INSTANTANEA + 1
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+        with self.assertRaisesRegex(ValueError, "versión de formato"):
+            bd.Biblioteca(ruta=self.ruta, sumidero=bd.SumideroNulo())
+
+
+class _SumideroLista:
+    """Guarda los mensajes emitidos para compararlos."""
+    activo = True
+
+    def __init__(self):
+        self.mensajes = []
+
+    def emitir(self, evento):
+        self.mensajes.append(evento.mensaje())
+
+    def cerrar(self):
+        pass
+
+
+class TestBibliotecaFragmentada(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.libros, cls.usuarios, cls.vocabulario = bd.generar_datos(3000)
+        cls.biblioteca = bd.Biblioteca(sumidero=_SumideroLista())
+        for libro in cls.libros:
+            cls.biblioteca._añadir(bd.Libro(libro.meta, libro.categoria, libro.isbn))
+        for usuario in cls.usuarios:
+            cls.biblioteca._registrar_usuario(bd.Usuario(usuario.nombre, usuario.user_id))
+        cls.fragmentada = bd.BibliotecaFragmentada(3, sumidero=_SumideroLista())
+        cls.fragmentada.añadir_libros(cls.libros)
+        cls.fragmentada.registrar_usuarios(cls.usuarios)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fragmentada.cerrar()
+
+    def setUp(self):
+        self.biblioteca.sumidero.mensajes.clear()
+        self.fragmentada.sumidero.mensajes.clear()
+
+    def test_busquedas_en_el_mismo_orden(self):
+        azar = random.Random(5)
+        consultas = [palabra[:azar.randint(3, 6)] for palabra in azar.sample(self.vocabulario, 40)]
+        for texto in consultas:
+            for campo in ("titulo", "autor"):
+                esperado = [libro.isbn for libro in self.biblioteca.buscar(**{campo: texto})]
+                obtenido = [libro.isbn for libro in self.fragmentada.buscar(**{campo: texto})]
+                self.assertEqual(obtenido, esperado, (campo, texto))
+
+    def test_mismos_mensajes(self):
+        azar = random.Random(6)
+        ahora = 1_000_000.0
+        for _ in range(400):
+            isbn = azar.choice(self.libros).isbn if azar.random() < 0.95 else "no-existe"
+            user_id = azar.choice(self.usuarios).user_id if azar.random() < 0.95 else "nadie"
+            operacion = azar.choice(("prestar_libro", "devolver_libro", "renovar", "listar_prestados_usuario"))
+            if operacion == "devolver_libro" and azar.random() < 0.7:
+                user_id = self.biblioteca.prestamos.get(isbn) or user_id
+            argumentos = {"prestar_libro": (isbn, user_id), "devolver_libro": (isbn, user_id),
+                          "renovar": (isbn, user_id, ahora),
+                          "listar_prestados_usuario": (user_id,)}[operacion]
+            self.assertEqual(getattr(self.fragmentada, operacion)(*argumentos),
+                             getattr(self.biblioteca, operacion)(*argumentos))
+        self.assertEqual(self.fragmentada.sumidero.mensajes, self.biblioteca.sumidero.mensajes)
+
+
+if __name__ == "__main__":
+    unittest.main()